@@ -1,11 +1,12 @@
 import os, json, streamlit as st
 from cryptography.fernet import Fernet
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytz
 import traceback
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from run_history import open_history
+from catalog import product_size, product_title
+from current_state import open_state, format_age
+import dispatcher
 
 def format_awst_time(ts):
     """Convert any timestamp to AWST formatted time."""
@@ -29,26 +30,6 @@ def format_awst_time(ts):
     awst_time = dt.astimezone(awst)
     return awst_time.strftime('%Y-%m-%d %H:%M:%S AWST')
 
-# Email configuration - add this after format_awst_time
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
-SMTP_USER = os.getenv("SMTP_USER")
-SMTP_PASS = os.getenv("SMTP_PASS")
-FROM_EMAIL = os.getenv("FROM_EMAIL", SMTP_USER)
-
-def send_email(to_email, subject, html_content):
-    """Send an email with HTML content."""
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subject
-    msg["From"] = FROM_EMAIL
-    msg["To"] = to_email
-    msg.attach(MIMEText(html_content, "html"))
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as s:
-        s.starttls()
-        s.login(SMTP_USER, SMTP_PASS)
-        s.sendmail(FROM_EMAIL, to_email, msg.as_string())
-    print(f"Email sent to {to_email}")
-    
 # ─── PAGE CONFIG & FONT ──────────────────────────────────────
 st.set_page_config(
     page_title="BamBot - Bamba Tracker",
@@ -64,7 +45,9 @@ if "token" in query_params:
     try:
         from supabase_client import verify_unsubscribe_token, unsubscribe_email
         
-        token = query_params["token"][0]
+        token = query_params["token"]
+        if isinstance(token, list):   # older Streamlit query-param API
+            token = token[0]
         # Show token information for debugging
         st.write(f"Debug - Token received: {token[:10]}...")
         
@@ -322,9 +305,12 @@ if st.button("Subscribe", use_container_width=True):
                             </div>
                             """
                             
-                            # Send the welcome email
-                            send_email(email, welcome_subject, welcome_html)
-                            print(f"Welcome email sent to {email}")
+                            # Send the welcome email now. Nothing drains an outbox on the app's
+                            # host later, so a queued welcome that failed would never be retried.
+                            today  = datetime.now(pytz.timezone('Australia/Perth')).date().isoformat()
+                            report = dispatcher.dispatch([dispatcher.message(email, welcome_subject, welcome_html,
+                                                                             key=f"welcome:{today}:{email}")])
+                            print(report.summary())
                         except Exception as e:
                             print(f"Error sending welcome email: {e}")
                         # *** END OF WELCOME EMAIL CODE ***
@@ -371,8 +357,10 @@ st.subheader("🔍 Current Bamba Status / גיא פינאטס של הבמבות"
 
 try:
     # Refresh the data on each page load to ensure we have the latest
-    hist = json.load(open("history.json"))["runs"]
-    latest = hist[-1]
+    history = open_history()
+    latest  = history.latest()
+    state   = open_state(history)   # restock times, from history.state_file
+    now     = datetime.now(pytz.timezone('Australia/Perth'))
     
     # Format timestamp for better readability
     ts_raw = latest[0]["timestamp"]
@@ -385,27 +373,38 @@ try:
     for i, store_data in enumerate(latest):
         with columns[i]:
             # Store header with availability indicator
-            store_avail = "✅" if store_data["available"] else "❌"
+            if store_data.get("status", "ok") == "ok" or store_data.get("error", {}).get("kind") == "not_due":
+                store_avail = "✅" if store_data["available"] else "❌"
+            else:
+                store_avail = "❔"
             st.write(f"### {store_avail} {store_data['store']}")
             
+            # Not due under adaptive scheduling: these are the last checked products
+            if store_data.get("error", {}).get("kind") == "not_due":
+                if store_data.get("last_checked"):
+                    st.caption(f"Not checked this run – showing the check at {format_awst_time(store_data['last_checked'])}")
+                else:
+                    st.caption("Not checked this run")
+            elif store_data.get("status", "ok") != "ok":
+                # Errored, or skipped by the circuit breaker: availability unknown
+                st.write("Couldn't check this store this time – status unknown")
+                continue
+            
             if not store_data["products"]:
                 st.write("No products found at this store")
                 continue
                 
             # Display each product as a card
             for product in store_data["products"]:
-                # Extract size from product name if available (e.g., "25g" from "Osem Bamba Peanut Snack KB | 25g")
-                size = "Unknown size"
-                if "|" in product["name"]:
-                    size_part = product["name"].split("|")[1].strip()
-                    size = size_part
-                
-                # Split product name for cleaner display
-                product_name = product["name"].split("|")[0].strip() if "|" in product["name"] else product["name"]
+                # Size was parsed at scrape time (e.g. "25g" for "Osem Bamba Peanut Snack KB | 25g")
+                size = product_size(product, "Unknown size")
+                product_name = product_title(product)
                 
                 # Style based on availability
                 availability_class = "" if product["available"] else "product-unavailable"
                 mark = "✅" if product["available"] else "❌"
+                age  = state.since_restock(store_data["store"], product["name"], now)
+                restock = f"{format_age(age)} ago" if age is not None else "not seen in stock yet"
                 
                 st.markdown(f"""
                 <div class="product-card {availability_class}">
@@ -413,6 +412,7 @@ try:
                     <div><b>Size:</b> {size}</div>
                     <div><b>Price:</b> {product["price"]}</div>
                     <div><b>Status:</b> {"Available now" if product["available"] else "Currently unavailable"}</div>
+                    <div><b>Last restock:</b> {restock}</div>
                 </div>
                 """, unsafe_allow_html=True)
 except Exception as e:
@@ -427,68 +427,43 @@ st.subheader("Availability History")
 
 # Add a refresh button
 refresh = st.button("🔄 Refresh History Data")
+history_range = st.selectbox("Show", ["Last 30 checks", "Last 7 days", "Last 30 days", "Last 90 days"])
 
 try:
     # Always reload data from file to ensure we have latest
-    with open("history.json", "r") as f:
-        hist_content = f.read()
-        hist = json.loads(hist_content)["runs"]
+    history = open_history()
+    since, last = None, None
+    if history_range == "Last 30 checks":
+        last = 30
+    else:
+        days = int(history_range.split()[1])
+        since = (datetime.now(pytz.timezone('Australia/Perth')) - timedelta(days=days)).isoformat()
+    # Available/total per size for each store and run, counted by the backend
+    # (the JSONL log from its compact records, SQLite in a query)
+    counts = history.size_counts(since=since, last=last)
     
-    if len(hist) > 1:  # Only show if we have multiple data points
+    if len(counts) > 1:  # Only show if we have multiple data points
         # Convert data for charting with size breakdown
         chart_data = []
         
-        for i, run in enumerate(hist):
+        for i, (run_ts, stores) in enumerate(counts):
             # Get timestamp in readable format
-            ts = run[0]["timestamp"].replace("T", " ").split(".")[0]
+            ts = run_ts.replace("T", " ").split(".")[0]
             
             # Process each store
-            for store_data in run:
-                store_name = store_data["store"]
-                
-                # Initialize counters for different product sizes
-                size_25g_available = 0
-                size_100g_available = 0
-                size_25g_total = 0
-                size_100g_total = 0
-                
-                # Count products by size
-                for product in store_data["products"]:
-                    # Extract size from product name
-                    product_size = "unknown"
-                    if "|" in product["name"]:
-                        size_part = product["name"].split("|")[1].strip()
-                        if "25g" in size_part:
-                            product_size = "25g"
-                            size_25g_total += 1
-                            if product["available"]:
-                                size_25g_available += 1
-                        elif "100g" in size_part:
-                            product_size = "100g"
-                            size_100g_total += 1
-                            if product["available"]:
-                                size_100g_available += 1
-                    
-                # Add entry for this store and timestamp with size breakdown
-                chart_data.append({
-                    "run": i,
-                    "time": ts,
-                    "store": store_name,
-                    "size": "25g",
-                    "available": size_25g_available,
-                    "total": size_25g_total,
-                    "availability_pct": round(size_25g_available/size_25g_total*100 if size_25g_total > 0 else 0)
-                })
-                
-                chart_data.append({
-                    "run": i,
-                    "time": ts,
-                    "store": store_name,
-                    "size": "100g",
-                    "available": size_100g_available,
-                    "total": size_100g_total,
-                    "availability_pct": round(size_100g_available/size_100g_total*100 if size_100g_total > 0 else 0)
-                })
+            for store_name, by_size in stores:
+                for size in ("25g", "100g"):
+                    available = sum(c[0] for s, c in by_size.items() if size in s)
+                    total = sum(c[1] for s, c in by_size.items() if size in s)
+                    chart_data.append({
+                        "run": i,
+                        "time": ts,
+                        "store": store_name,
+                        "size": size,
+                        "available": available,
+                        "total": total,
+                        "availability_pct": round(available/total*100 if total > 0 else 0)
+                    })
         
         # Display as a table with better formatting
         st.write("### Check History Data")
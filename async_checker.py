@@ -0,0 +1,203 @@
+"""
+Concurrent Bamba store checker (asyncio + playwright.async_api).
+– One shared Chromium, one isolated context per store.
+– At most `concurrency` stores in flight; each store gets `store_timeout_seconds`.
+– Produces the same result dicts as bamba_checker.check_store, in config order.
+"""
+
+import time, asyncio
+from playwright.async_api import async_playwright
+
+from bamba_checker import (
+    get_awst_time, new_result, tile_to_product,
+    TILE_SELECTOR, EXTRACT_TILES_JS, SEARCH_URL, RESULTS_SELECTOR,
+    BROWSER_OPTIONS, CONTEXT_OPTIONS, HIDE_WEBDRIVER_JS,
+)
+from catalog import describe
+from request_blocker import RequestBlocker
+import session_state
+import coles_payload
+from pacing import Pacer
+from run_metrics import RunMetrics
+from screenshots import ScreenshotPolicy
+import resilience
+from resilience import aretry_call, classify_failure, mark_failed, mark_unknown, CircuitBreaker, RETRYABLE
+
+DEFAULT_CONCURRENCY   = 3
+DEFAULT_STORE_TIMEOUT = 180   # seconds
+
+# ─────────────────────────────────────────────────────────────
+# 1) ASYNC SCRAPING HELPERS
+# ─────────────────────────────────────────────────────────────
+async def new_store_context(browser, storage_state=None):
+    """Create an isolated context (own cookies/location) for one store."""
+    ctx=await browser.new_context(storage_state=storage_state, **CONTEXT_OPTIONS)
+    await ctx.add_init_script(HIDE_WEBDRIVER_JS)
+    return ctx
+
+async def set_store_location(page, store, pacer, metrics, shots, opts):
+    """Full flow: store page → Set location → home/cookies → search box."""
+    name = store["name"]
+    # 1) Open store & Set location
+    with metrics.span("goto_store", name):
+        await aretry_call(lambda: page.goto(store["url"], timeout=opts["goto_timeout_ms"]), "goto_store", opts, f"[{name}] ")
+    await shots.acapture(page, name, "1_store", metrics)
+    with metrics.span("set_location", name):
+        await page.wait_for_selector("text=Set location", timeout=10000)
+        await pacer.apause(); await page.click("text=Set location")
+        await pacer.apause(page)
+    await shots.acapture(page, name, "2_loc", metrics)
+
+    # 2) Home & cookies
+    with metrics.span("home", name):
+        await aretry_call(lambda: page.goto("https://www.coles.com.au", timeout=opts["goto_timeout_ms"]), "home", opts, f"[{name}] ")
+        try: await page.click("button:has-text('Accept All Cookies')", timeout=5000)
+        except Exception: pass
+    await shots.acapture(page, name, "3_home", metrics)
+
+    # 3) Search "bamba"
+    with metrics.span("search", name):
+        await page.fill("input[placeholder*='Search']", "bamba")
+        await pacer.apause(page); await page.click("div[role='option']")
+        await page.wait_for_url("**/search/products**", timeout=15000)
+
+async def scrape_results(page, store, capture, config=None, metrics=None):
+    """Products on the loaded results page: embedded page data first, tiles as fallback."""
+    metrics = metrics or RunMetrics()
+    extraction = (config or {}).get("extraction", {})
+    if extraction.get("mode", "payload") == "payload":
+        try:
+            with metrics.span("extraction", store["name"]):
+                payload  = await coles_payload.read_payload_async(page, capture)
+                products = coles_payload.parse_search_payload(payload)
+            if extraction.get("fixture_dir"):
+                coles_payload.save_fixture(payload, store, extraction["fixture_dir"])
+            print(f"  🧾 [{store['name']}] Read {len(products)} products from page data")
+            return products
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"  ↩️ [{store['name']}] Page data unavailable ({e}); reading tiles instead")
+    with metrics.span("tile_wait", store["name"]):
+        await page.wait_for_selector(RESULTS_SELECTOR, timeout=15000)
+    with metrics.span("extraction", store["name"]):
+        return [tile_to_product(r) for r in
+                await page.eval_on_selector_all(TILE_SELECTOR, EXTRACT_TILES_JS)]
+
+async def check_store(store, browser, result, config=None, pacer=None, metrics=None, shots=None):
+    """Async twin of bamba_checker.check_store; fills `result` in place.
+
+    The result dict is owned by the caller so whatever was scraped before a
+    timeout is still reported.
+    """
+    print(f"\n🔄 Checking {store['name']} at {get_awst_time().strftime('%H:%M:%S AWST')}…")
+    pacer=pacer or Pacer(config)
+    metrics=metrics or RunMetrics()
+    shots=shots or ScreenshotPolicy(config)
+    opts=resilience.settings(config)
+    started=time.monotonic()
+    state=session_state.load(store, config)
+    ctx=await new_store_context(browser, state)
+    blocker=await RequestBlocker((config or {}).get("request_blocking")).attach_async(ctx)
+    page=await ctx.new_page()
+    capture=coles_payload.AsyncPayloadCapture().attach(page)
+
+    try:
+        products = None
+        if state:
+            # Location already set: go straight to the results
+            try:
+                with metrics.span("goto_search", store["name"]):
+                    await aretry_call(lambda: page.goto(SEARCH_URL, timeout=opts["goto_timeout_ms"]),
+                                      "goto_search", opts, f"[{store['name']}] ")
+                if not session_state.has_store(store, await ctx.storage_state()):
+                    raise session_state.StaleSession(f"no longer set to store {store['id']}")
+                products = await scrape_results(page, store, capture, config, metrics)
+                print(f"  ⚡ [{store['name']}] Reused saved location")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if classify_failure(e) in RETRYABLE:
+                    raise   # the site is down, not the session
+                print(f"  ♻️ Saved location for {store['name']} is stale ({e}); setting it again")
+                session_state.discard(store, config)
+                await ctx.clear_cookies()
+                try: await page.evaluate("localStorage.clear()")
+                except Exception: pass
+        if products is None:
+            await set_store_location(page, store, pacer, metrics, shots, opts)
+            session_state.save(store, await ctx.storage_state(), config)
+            products = await scrape_results(page, store, capture, config, metrics)
+        if shots.wants("4_res"):
+            await pacer.apause(page); await shots.acapture(page, store["name"], "4_res", metrics)
+
+        # 4) Record each product
+        if not products:
+            print(f"  ❓ [{store['name']}] No product tiles found!")
+        for product in products:
+            mark = "✅" if product["available"] else "❌"
+            result["products"].append(describe(product))
+            if product["available"]: result["available"] = True
+            print(f"  {mark} [{store['name']}] {product['name']} @ {product['price']}")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        mark_failed(result, metrics.current.get(store["name"], "start"), e)
+        print(f"  ⚠️ [{store['name']}] Error ({result['error']['kind']} at {result['error']['step']}):",e)
+        try: await shots.acapture(page, store["name"], "error", metrics)
+        except Exception: pass
+    finally:
+        print(f"  🚫 [{store['name']}]", blocker.summary())
+        with metrics.span("close", store["name"]):
+            await ctx.close()
+        metrics.add("store_total", time.monotonic() - started, store["name"])
+        print(f"  🧹 Closed context for {store['name']}")
+    return result
+
+# ─────────────────────────────────────────────────────────────
+# 2) BOUNDED FAN-OUT
+# ─────────────────────────────────────────────────────────────
+async def _check_bounded(store, browser, semaphore, store_timeout, config, pacer, metrics, shots, breaker):
+    async with semaphore:
+        result = new_result(store)
+        if not breaker.allow(store):
+            return mark_unknown(result, "circuit_open")
+        try:
+            await asyncio.wait_for(check_store(store, browser, result, config, pacer, metrics, shots), store_timeout)
+        except asyncio.TimeoutError as e:
+            print(f"  ⏱️ {store['name']} timed out after {store_timeout}s")
+            mark_failed(result, metrics.current.get(store["name"], "start"), e)
+        breaker.record(result)
+        return result
+
+async def check_stores_async(stores, concurrency=DEFAULT_CONCURRENCY, store_timeout=DEFAULT_STORE_TIMEOUT,
+                             config=None, metrics=None):
+    """Check `stores` concurrently; results come back in the same order."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    pacer = Pacer(config)
+    metrics = metrics or RunMetrics()
+    shots = ScreenshotPolicy(config)
+    breaker = CircuitBreaker(config)
+    async with async_playwright() as p:
+        with metrics.span("launch"):
+            browser = await p.chromium.launch(**pacer.browser_options(BROWSER_OPTIONS))
+        try:
+            return await asyncio.gather(*(
+                _check_bounded(store, browser, semaphore, store_timeout, config, pacer, metrics, shots, breaker)
+                for store in stores
+            ))
+        finally:
+            with metrics.span("browser_close"):
+                await browser.close()
+            shots.close()
+            breaker.save()
+            print("🧹 Closed browser")
+            print(pacer.report())
+
+def run_async(stores, config, metrics=None):
+    """Entry point used by bamba_checker.main() in async mode."""
+    opts = config.get("async", {})
+    concurrency   = opts.get("concurrency", DEFAULT_CONCURRENCY)
+    store_timeout = opts.get("store_timeout_seconds", DEFAULT_STORE_TIMEOUT)
+    print(f"⚡ Async mode: {len(stores)} stores, {concurrency} at a time, {store_timeout}s per store")
+    return list(asyncio.run(check_stores_async(stores, concurrency, store_timeout, config, metrics)))
@@ -4,17 +4,30 @@ One‑shot Bamba Availability Checker.
 – Run once (scheduled by GitHub Actions cron).
 – Scrapes multiple Coles stores for Bamba.
 – Sends "funny" immediate email via SMTP.
-– Appends each run to history.json.
+– Appends each run to the history log (history.jsonl).
 """
 
-import os, sys, time, random, json
-from datetime import datetime
+import os, sys, time, random, json, argparse
+from datetime import datetime, timedelta
 import pytz
-from playwright.sync_api import sync_playwright
-from cryptography.fernet import Fernet
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+# Playwright, cryptography and smtplib/email (mailer.py) are imported where they are used,
+# so the outside-operating-hours exit and quiet runs don't pay for them.
+from request_blocker import RequestBlocker
+import session_state
+import coles_payload
+from pacing import Pacer
+from run_metrics import RunMetrics
+from screenshots import ScreenshotPolicy
+import sharding
+import scheduler
+from run_history import open_history
+from current_state import open_state
+from catalog import describe, product_size, product_title
+import dispatcher
+import outbox
+import unsubscribe
+import resilience
+from resilience import retry_call, classify_failure, mark_failed, mark_unknown, CircuitBreaker, RETRYABLE
 
 # Collection of Bamba facts for the enhanced subscription
 BAMBA_FACTS = [
@@ -71,6 +84,7 @@ def load_subscribers():
         if not FERNET_KEY:
             print("⚠️ FERNET_KEY not set; exiting.")
             sys.exit(1)
+        from cryptography.fernet import Fernet
         fernet = Fernet(FERNET_KEY.encode())
         
         out = []
@@ -90,362 +104,544 @@ def load_subscribers():
 # ─────────────────────────────────────────────────────────────
 # 2) SMTP EMAIL HELPER
 # ─────────────────────────────────────────────────────────────
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-SMTP_PORT   = int(os.getenv("SMTP_PORT", "587"))
-SMTP_USER   = os.getenv("SMTP_USER")
-SMTP_PASS   = os.getenv("SMTP_PASS")
-FROM_EMAIL  = os.getenv("FROM_EMAIL", SMTP_USER)
-
-def send_email(to_email, subject, html_content):
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subject
-    msg["From"]    = FROM_EMAIL
-    msg["To"]      = to_email
-    msg.attach(MIMEText(html_content, "html"))
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as s:
-        s.starttls()
-        s.login(SMTP_USER, SMTP_PASS)
-        s.sendmail(FROM_EMAIL, to_email, msg.as_string())
-    print(f"  ✉️ Email sent to {to_email}")
+# Emails are queued in outbox.py's durable outbox and delivered by
+# dispatcher.py (parallel, rate-limited) over mailer.py's pooled SMTP
+# sessions; daily_summary.py and app.py share all three.
 
 # ─────────────────────────────────────────────────────────────
-# 3) YOUR STORES
+# 3) YOUR STORES (config.json)
 # ─────────────────────────────────────────────────────────────
-STORES = [
-    {"name":"Dianella",   "url":"https://www.coles.com.au/find-stores/coles/wa/dianella-256"},
-    {"name":"Mirrabooka", "url":"https://www.coles.com.au/find-stores/coles/wa/mirrabooka-314"},
-]
+def load_stores(config):
+    """The stores to check, from the "stores" list in config.json."""
+    stores = []
+    for store in config.get("stores", []):
+        if not store.get("name") or not store.get("url"):
+            print(f"⚠️ Skipping store entry without name/url: {store}")
+            continue
+        stores.append(store)
+    return stores
+
+def schedule_stores(stores, config):
+    """(stores due now, carried-forward results for the rest) under adaptive scheduling."""
+    if not scheduler.settings(config)["enabled"]:
+        return stores, []
+    now  = get_awst_time()
+    since = (now - timedelta(days=scheduler.settings(config)["learn_days"])).isoformat()
+    runs = open_history(config).runs(since=since)
+    due, later = scheduler.due_stores(stores, runs, config, now)
+    print(f"🗓️ {len(due)} of {len(stores)} stores due this run")
+    return due, [scheduler.carry_forward(mark_unknown(new_result(s), "not_due"), runs) for s in later]
 
 # ─────────────────────────────────────────────────────────────
 # 4) SCRAPING HELPERS
 # ─────────────────────────────────────────────────────────────
-def human_delay(a=500,b=1500):
-    time.sleep(random.uniform(a/1000,b/1000))
+BROWSER_OPTIONS = {"headless": True}   # slow_mo comes from the pacing profile
+CONTEXT_OPTIONS = {
+    "viewport":   {"width":1280,"height":920},
+    "locale":     "en-US",
+    "user_agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+        " AppleWebKit/537.36 (KHTML, like Gecko)"
+        " Chrome/120.0.0.0 Safari/537.36"
+    ),
+}
+HIDE_WEBDRIVER_JS = "Object.defineProperty(navigator,'webdriver',{get:()=>undefined})"
 
-def take_screenshot(page,store,step):
-    folder="coles_screenshots"; os.makedirs(folder,exist_ok=True)
-    ts=get_awst_time().strftime("%Y%m%d_%H%M%S")
-    path=f"{folder}/{store}_{step}_{ts}.png"
-    page.screenshot(path=path); print("  📸",path)
+def launch_browser(p, pacer):
+    """Launch the single Chromium instance shared by every store in a run."""
+    return p.chromium.launch(**pacer.browser_options(BROWSER_OPTIONS))
 
-def check_store(store):
-    awst_now = get_awst_time()
-    print(f"\n🔄 Checking {store['name']} at {awst_now.strftime('%H:%M:%S AWST')}…")
-    result = {
+def new_store_context(browser, storage_state=None):
+    """Create an isolated context (own cookies/location) for one store."""
+    ctx=browser.new_context(storage_state=storage_state, **CONTEXT_OPTIONS)
+    ctx.add_init_script(HIDE_WEBDRIVER_JS)
+    return ctx
+
+def new_result(store, awst_now=None):
+    """Empty result dict for a store; filled in by the scrapers."""
+    awst_now = awst_now or get_awst_time()
+    return {
         "store":     store["name"],
         "timestamp": awst_now.isoformat(),
         "available": False,
-        "products":  []
+        "products":  [],
+        "status":    "ok",
     }
-    with sync_playwright() as p:
-        browser=p.chromium.launch(headless=True,slow_mo=100)
-        ctx=browser.new_context(
-            viewport={"width":1280,"height":920},
-            locale="en-US",
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-                " AppleWebKit/537.36 (KHTML, like Gecko)"
-                " Chrome/120.0.0.0 Safari/537.36"
-            )
-        )
-        page=ctx.new_page()
-        page.add_init_script("Object.defineProperty(navigator,'webdriver',{get:()=>undefined})")
 
+TILE_SELECTOR = "section[data-testid='product-tile']"
+
+# Runs inside the page: one IPC round trip for every tile instead of ~6 per
+# tile. Mirrors the old locator calls – first title/price match in document
+# order, and the same case-insensitive "Currently unavailable" text match
+# Playwright's text= engine does (textContent, whitespace collapsed).
+EXTRACT_TILES_JS = """
+tiles => tiles.map(t => {
+  const title = t.querySelector("h2.product__title, h3");
+  const price = t.querySelector("span.price__value, span.price, [data-testid='product-pricing']");
+  const text  = (t.textContent || "").replace(/\\s+/g, " ").toLowerCase();
+  return {
+    title:       title ? title.innerText : null,
+    price:       price ? price.innerText : null,
+    unavailable: text.includes("currently unavailable"),
+  };
+})
+"""
+
+def tile_to_product(raw):
+    """Turn one EXTRACT_TILES_JS record into a history product dict."""
+    return {
+        "name":      raw["title"].strip() if raw["title"] is not None else "Unknown",
+        "price":     raw["price"].strip() if raw["price"] is not None else "n/a",
+        "available": not raw["unavailable"],
+    }
+
+def read_tiles(page):
+    """Read every product tile on the results page in a single evaluation."""
+    return [tile_to_product(r) for r in page.eval_on_selector_all(TILE_SELECTOR, EXTRACT_TILES_JS)]
+
+SEARCH_URL = "https://www.coles.com.au/search/products?q=bamba"
+RESULTS_SELECTOR = "[data-testid='product-tiles']"
+
+def set_store_location(page, store, pacer, metrics, shots, opts):
+    """Full flow: store page → Set location → home/cookies → search box."""
+    name = store["name"]
+    # 1) Open store & Set location
+    with metrics.span("goto_store", name):
+        retry_call(lambda: page.goto(store["url"], timeout=opts["goto_timeout_ms"]), "goto_store", opts)
+    shots.capture(page, name, "1_store", metrics)
+    with metrics.span("set_location", name):
+        page.wait_for_selector("text=Set location", timeout=10000)
+        pacer.pause(); page.click("text=Set location")
+        pacer.pause(page)
+    shots.capture(page, name, "2_loc", metrics)
+
+    # 2) Home & cookies
+    with metrics.span("home", name):
+        retry_call(lambda: page.goto("https://www.coles.com.au", timeout=opts["goto_timeout_ms"]), "home", opts)
+        try: page.click("button:has-text('Accept All Cookies')", timeout=5000)
+        except: pass
+    shots.capture(page, name, "3_home", metrics)
+
+    # 3) Search "bamba"
+    with metrics.span("search", name):
+        page.fill("input[placeholder*='Search']", "bamba")
+        pacer.pause(page); page.click("div[role='option']")
+        page.wait_for_url("**/search/products**", timeout=15000)
+
+def scrape_results(page, store, capture, config=None, metrics=None):
+    """Products on the loaded results page: embedded page data first, tiles as fallback."""
+    metrics = metrics or RunMetrics()
+    extraction = (config or {}).get("extraction", {})
+    if extraction.get("mode", "payload") == "payload":
         try:
-            # 1) Open store & Set location
-            page.goto(store["url"], timeout=60000)
-            take_screenshot(page, store["name"], "1_store")
-            page.wait_for_selector("text=Set location", timeout=10000)
-            human_delay(); page.click("text=Set location")
-            human_delay(); take_screenshot(page, store["name"], "2_loc")
-
-            # 2) Home & cookies
-            page.goto("https://www.coles.com.au", timeout=60000)
-            try: page.click("button:has-text('Accept All Cookies')", timeout=5000)
-            except: pass
-            take_screenshot(page, store["name"], "3_home")
-
-            # 3) Search "bamba"
-            page.fill("input[placeholder*='Search']", "bamba")
-            human_delay(); page.click("div[role='option']")
-            page.wait_for_url("**/search/products**", timeout=15000)
-            human_delay(); take_screenshot(page, store["name"], "4_res")
-
-            # 4) Scrape each tile
-            page.wait_for_selector("[data-testid='product-tiles']", timeout=15000)
-            tiles = page.locator("section[data-testid='product-tile']").all()
-            if not tiles:
-                print("  ❓ No product tiles found!")
-            else:
-                for t in tiles:
-                    title_el = t.locator("h2.product__title, h3")
-                    title    = title_el.first.inner_text().strip() if title_el.count() else "Unknown"
-                    price_el = t.locator("span.price__value, span.price, [data-testid='product-pricing']")
-                    price    = price_el.first.inner_text().strip() if price_el.count() else "n/a"
-                    
-                    # --- THIS IS THE CORRECTED LINE ---
-                    # Instead of a data-testid, we look for the visible text, which is more robust.
-                    unavailable = t.locator("text=Currently unavailable").count() > 0
-                    
-                    available   = not unavailable
-                    mark        = "✅" if available else "❌"
-                    result["products"].append({"name":title,"price":price,"available":available})
-                    if available: result["available"] = True
-                    print(f"  {mark} {title} @ {price}")
+            with metrics.span("extraction", store["name"]):
+                payload  = coles_payload.read_payload(page, capture)
+                products = coles_payload.parse_search_payload(payload)
+            if extraction.get("fixture_dir"):
+                coles_payload.save_fixture(payload, store, extraction["fixture_dir"])
+            print(f"  🧾 Read {len(products)} products from page data")
+            return products
         except Exception as e:
-            print("  ⚠️ Error:",e)
-            take_screenshot(page, store["name"], "error")
-        finally:
-            browser.close()
-            print(f"  🧹 Closed browser for {store['name']}")
+            print(f"  ↩️ Page data unavailable ({e}); reading tiles instead")
+    with metrics.span("tile_wait", store["name"]):
+        page.wait_for_selector(RESULTS_SELECTOR, timeout=15000)
+    with metrics.span("extraction", store["name"]):
+        return read_tiles(page)
+
+def check_store(store, browser, config=None, pacer=None, metrics=None, shots=None):
+    awst_now = get_awst_time()
+    print(f"\n🔄 Checking {store['name']} at {awst_now.strftime('%H:%M:%S AWST')}…")
+    result = new_result(store, awst_now)
+    pacer=pacer or Pacer(config)
+    metrics=metrics or RunMetrics()
+    shots=shots or ScreenshotPolicy(config)
+    opts=resilience.settings(config)
+    started=time.monotonic()
+    state=session_state.load(store, config)
+    ctx=new_store_context(browser, state)
+    blocker=RequestBlocker((config or {}).get("request_blocking")).attach(ctx)
+    page=ctx.new_page()
+    capture=coles_payload.PayloadCapture().attach(page)
+
+    try:
+        products = None
+        if state:
+            # Location already set: go straight to the results
+            try:
+                with metrics.span("goto_search", store["name"]):
+                    retry_call(lambda: page.goto(SEARCH_URL, timeout=opts["goto_timeout_ms"]), "goto_search", opts)
+                if not session_state.has_store(store, ctx.storage_state()):
+                    raise session_state.StaleSession(f"no longer set to store {store['id']}")
+                products = scrape_results(page, store, capture, config, metrics)
+                print("  ⚡ Reused saved location")
+            except Exception as e:
+                if classify_failure(e) in RETRYABLE:
+                    raise   # the site is down, not the session
+                print(f"  ♻️ Saved location for {store['name']} is stale ({e}); setting it again")
+                session_state.discard(store, config)
+                ctx.clear_cookies()
+                try: page.evaluate("localStorage.clear()")
+                except: pass
+        if products is None:
+            set_store_location(page, store, pacer, metrics, shots, opts)
+            session_state.save(store, ctx.storage_state(), config)
+            products = scrape_results(page, store, capture, config, metrics)
+        if shots.wants("4_res"):
+            pacer.pause(page); shots.capture(page, store["name"], "4_res", metrics)
+
+        # 4) Record each product
+        if not products:
+            print("  ❓ No product tiles found!")
+        for product in products:
+            mark = "✅" if product["available"] else "❌"
+            result["products"].append(describe(product))   # size/price parsed once, here
+            if product["available"]: result["available"] = True
+            print(f"  {mark} {product['name']} @ {product['price']}")
+    except Exception as e:
+        mark_failed(result, metrics.current.get(store["name"], "start"), e)
+        print(f"  ⚠️ Error ({result['error']['kind']} at {result['error']['step']}):",e)
+        try: shots.capture(page, store["name"], "error", metrics)
+        except: pass
+    finally:
+        print("  🚫", blocker.summary())
+        with metrics.span("close", store["name"]):
+            ctx.close()
+        metrics.add("store_total", time.monotonic() - started, store["name"])
+        print(f"  🧹 Closed context for {store['name']}")
     return result
     
+def check_stores_on(browser, stores, config, pacer, metrics, shots):
+    """Check stores one after another on an already running browser."""
+    results = []
+    breaker = CircuitBreaker(config)
+    try:
+        for i, store in enumerate(stores):
+            if not breaker.allow(store):
+                results.append(mark_unknown(new_result(store), "circuit_open"))
+                continue
+            if i: pacer.between_stores()
+            result = check_store(store, browser, config, pacer, metrics, shots)
+            breaker.record(result)
+            results.append(result)
+    finally:
+        breaker.save()
+    return results
+
+def check_stores(stores, config=None, metrics=None):
+    """Check stores one after another on a single shared browser."""
+    pacer = Pacer(config)
+    metrics = metrics or RunMetrics()
+    shots = ScreenshotPolicy(config)
+    from playwright.sync_api import sync_playwright
+    with sync_playwright() as p:
+        with metrics.span("launch"):
+            browser = launch_browser(p, pacer)
+        try:
+            results = check_stores_on(browser, stores, config, pacer, metrics, shots)
+        finally:
+            with metrics.span("browser_close"):
+                browser.close()
+            shots.close()
+            print("🧹 Closed browser")
+    print(pacer.report())
+    return results
+    
 # ─────────────────────────────────────────────────────────────
 # 5) APPEND TO HISTORY
 # ─────────────────────────────────────────────────────────────
-def append_history(run_results):
-    hf = "history.json"
-    history = {"runs": []}
-    if os.path.exists(hf):
-        history = json.load(open(hf))
-    history["runs"].append(run_results)
-    history["runs"] = history["runs"][-30:]
-    with open(hf,"w") as f:
-        json.dump(history, f, indent=2)
+def append_history(run_results, history=None):
+    (history or open_history()).append(run_results)
 
 # ─────────────────────────────────────────────────────────────
 # 6) CHANGE DETECTION
 # ─────────────────────────────────────────────────────────────
-def detect_changes(current_results, history):
-    """Detect changes in product availability between current and previous check.
+def was_checked(store_data):
+    """False for stores that errored or were skipped this run (unknown state)."""
+    return store_data.get("status", "ok") == "ok"
+
+def detect_changes(current_results, state):
+    """Detect changes in product availability between the current check and
+    each store's last successful one (the current state index).
     
     Returns:
         Dictionary of changes per store and product
     """
     changes = {}
-    
-    # If no history yet, consider everything as new
-    if not history["runs"]:
-        for store_data in current_results:
-            store_name = store_data["store"]
-            changes[store_name] = []
-            
-            for product in store_data["products"]:
-                changes[store_name].append({
-                    "product": product["name"],
-                    "change_type": "new" if product["available"] else "unavailable",
-                    "price": product["price"],
-                    "available": product["available"]
-                })
-        return changes
-    
-    # Get the most recent previous check
-    prev_check = history["runs"][-1]
-    
-    # Create a lookup for easier comparison
-    prev_status = {}
-    for store_data in prev_check:
-        store_name = store_data["store"]
-        prev_status[store_name] = {}
-        
-        for product in store_data["products"]:
-            prev_status[store_name][product["name"]] = {
-                "available": product["available"],
-                "price": product["price"]
-            }
-    
-    # Now compare current results with previous
     for store_data in current_results:
         store_name = store_data["store"]
         changes[store_name] = []
+        if not was_checked(store_data):
+            continue
         
         for product in store_data["products"]:
-            product_name = product["name"]
-            
-            # If product existed before
-            if store_name in prev_status and product_name in prev_status[store_name]:
-                # Check if availability changed
-                prev_available = prev_status[store_name][product_name]["available"]
-                curr_available = product["available"]
-                
-                if prev_available != curr_available:
-                    change_type = "now_available" if curr_available else "now_unavailable"
-                    changes[store_name].append({
-                        "product": product_name,
-                        "change_type": change_type,
-                        "price": product["price"],
-                        "available": curr_available
-                    })
+            known = state.get(store_name, product["name"])
+            if known is None:
+                # New product (or no history yet)
+                change_type = "new" if product["available"] else "unavailable"
+            elif known["available"] != product["available"]:
+                change_type = "now_available" if product["available"] else "now_unavailable"
             else:
-                # New product
-                changes[store_name].append({
-                    "product": product_name,
-                    "change_type": "new" if product["available"] else "unavailable",
-                    "price": product["price"],
-                    "available": product["available"]
-                })
+                continue
+            changes[store_name].append({
+                "product": product["name"],
+                "size": product_size(product, "Unknown"),
+                "change_type": change_type,
+                "price": product["price"],
+                "available": product["available"]
+            })
     
     return changes
 
 # ─────────────────────────────────────────────────────────────
 # 7) CONSOLIDATED EMAIL NOTIFICATIONS
 # ─────────────────────────────────────────────────────────────
-def send_notifications(store_results, subscribers):
-    """Send notifications to subscribers based on their preferences."""
+def segment_key(subscriber):
+    """The preferences an immediate email's body depends on."""
+    return (subscriber.get("store_preference", "both"),
+            subscriber.get("product_size_preference", "both"),
+            bool(subscriber.get("include_facts", False)))
+
+def has_relevant_changes(changes, store_pref, size_pref):
+    for store_name, store_changes in changes.items():
+        # Skip if not interested in this store
+        if store_pref != "both" and store_pref != store_name.lower():
+            continue
+        # Check if any changes are relevant to this size preference
+        for change in store_changes:
+            size = change["size"]
+            if size_pref == "both" or (size_pref == "25g" and "25g" in size) or (size_pref == "100g" and "100g" in size):
+                return True
+    return False
+
+def render_segment(store_results, changes, key):
+    """(subject, body without the unsubscribe footer, has relevant changes,
+    anything just became available) for one segment."""
+    store_pref, size_pref, include_facts = key
+    highlights = {(store_name, c["product"]): c for store_name, store_changes in changes.items()
+                  for c in store_changes}
     
-    # Load history to detect changes
-    history = {"runs": []}
-    if os.path.exists("history.json"):
-        history = json.load(open("history.json"))
+    # Create consolidated email content
+    subject = "🥜 Bamba Status Update"
     
-    # Detect changes since last check
-    changes = detect_changes(store_results, history)
+    # Start building the email
+    body = "<h1>Bamba Status Update</h1>"
     
-    # Build a consolidated notification for each subscriber
-    for subscriber in subscribers:
-        # Skip subscribers who want change notifications if nothing changed
-        if subscriber.get("notify_on_change_only", True):  # Default is now TRUE
-            has_relevant_changes = False
-            size_pref = subscriber.get("product_size_preference", "both")
-            
-            for store_name, store_changes in changes.items():
-                # Skip if not interested in this store
-                if subscriber.get("store_preference", "both") != "both" and subscriber.get("store_preference", "both") != store_name.lower():
-                    continue
-                    
-                # Check if any changes are relevant to this subscriber's size preference
-                for change in store_changes:
-                    product_name = change["product"]
-                    # Extract size from product name
-                    size = "Unknown"
-                    if "|" in product_name:
-                        size = product_name.split("|")[1].strip()
-                        
-                    # Check if this product matches the size preference
-                    if size_pref == "both" or (size_pref == "25g" and "25g" in size) or (size_pref == "100g" and "100g" in size):
-                        has_relevant_changes = True
-                        break
-                        
-                if has_relevant_changes:
-                    break
-            
-            if not has_relevant_changes:
-                continue
+    # Add a Bamba fact if subscribed
+    if include_facts:
+        fact = get_random_bamba_fact()
+        body += f"<div style='background-color: #f8f9fa; padding: 10px; margin: 10px 0; border-left: 4px solid #ffc107;'>"
+        body += f"<h3>🌟 Bamba Fact of the Day</h3>"
+        body += f"<p>{fact}</p>"
+        body += "</div>"
+    
+    any_available = False
+    
+    # Add store sections based on preferences
+    for store_data in store_results:
+        store_name = store_data["store"]
         
-        # Create consolidated email content
-        subject = "🥜 Bamba Status Update"
+        # Skip if not interested in this store
+        if store_pref != "both" and store_pref != store_name.lower():
+            continue
         
-        # Start building the email
-        body = "<h1>Bamba Status Update</h1>"
+        # Get timestamp in AWST
+        ts = store_data["timestamp"].split("T")[1][:8]
         
-        # Add a Bamba fact if subscribed
-        if subscriber.get("include_facts", False):
-            fact = get_random_bamba_fact()
-            body += f"<div style='background-color: #f8f9fa; padding: 10px; margin: 10px 0; border-left: 4px solid #ffc107;'>"
-            body += f"<h3>🌟 Bamba Fact of the Day</h3>"
-            body += f"<p>{fact}</p>"
-            body += "</div>"
+        body += f"<h2>{store_name} (Checked at {ts} AWST)</h2>"
         
-        any_available = False
+        if store_data.get("error", {}).get("kind") == "not_due":
+            body += "<p>Not checked this time – nothing has changed here lately.</p>"
+            continue
+        if not was_checked(store_data):
+            body += "<p>Couldn't check this store this time – status unknown.</p>"
+            continue
         
-        # Add store sections based on preferences
-        for store_data in store_results:
-            store_name = store_data["store"]
-            
-            # Skip if not interested in this store
-            if subscriber.get("store_preference", "both") != "both" and subscriber.get("store_preference", "both") != store_name.lower():
-                continue
-            
-            # Get timestamp in AWST
-            ts = store_data["timestamp"].split("T")[1][:8]
-            
-            body += f"<h2>{store_name} (Checked at {ts} AWST)</h2>"
+        if not store_data["products"]:
+            body += "<p>No Bamba products found at this store.</p>"
+            continue
+        
+        body += "<ul>"
+        
+        for product in store_data["products"]:
+            size = product_size(product, "Unknown")
+            product_name = product_title(product)
             
-            if not store_data["products"]:
-                body += "<p>No Bamba products found at this store.</p>"
-                continue
+            # Skip if not interested in this size
+            if size_pref != "both":
+                if size_pref == "25g" and "25g" not in size:
+                    continue
+                if size_pref == "100g" and "100g" not in size:
+                    continue
             
-            body += "<ul>"
+            status = "✅ Available" if product["available"] else "❌ Currently Unavailable"
             
-            for product in store_data["products"]:
-                # Extract size from product name
-                size = "Unknown"
-                if "|" in product["name"]:
-                    size = product["name"].split("|")[1].strip()
-                
-                product_name = product["name"].split("|")[0].strip() if "|" in product["name"] else product["name"]
-                
-                # Skip if not interested in this size
-                size_pref = subscriber.get("product_size_preference", "both")
-                if size_pref != "both":
-                    if size_pref == "25g" and "25g" not in size:
-                        continue
-                    if size_pref == "100g" and "100g" not in size:
-                        continue
-                
-                status = "✅ Available" if product["available"] else "❌ Currently Unavailable"
-                
-                # Highlight changes if notify_on_change_only is True
-                highlight = ""
-                for change in changes.get(store_name, []):
-                    if change["product"] == product["name"]:
-                        if change["change_type"] in ["now_available", "new"] and product["available"]:
-                            highlight = " - <strong style='color: green;'>JUST BECAME AVAILABLE!</strong>"
-                            any_available = True
-                        elif change["change_type"] == "now_unavailable":
-                            highlight = " - <strong style='color: red;'>JUST SOLD OUT!</strong>"
-                
-                body += f"<li><strong>{product_name}</strong> ({size}) - {status}{highlight}<br>Price: {product['price']}</li>"
+            # Highlight changes if notify_on_change_only is True
+            highlight = ""
+            change = highlights.get((store_name, product["name"]))
+            if change:
+                if change["change_type"] in ["now_available", "new"] and product["available"]:
+                    highlight = " - <strong style='color: green;'>JUST BECAME AVAILABLE!</strong>"
+                    any_available = True
+                elif change["change_type"] == "now_unavailable":
+                    highlight = " - <strong style='color: red;'>JUST SOLD OUT!</strong>"
             
-            body += "</ul>"
-        
-        # Update subject line if anything is available
-        if any_available:
-            subject = "🎉 Bamba Alert: Now Available!"
+            body += f"<li><strong>{product_name}</strong> ({size}) - {status}{highlight}<br>Price: {product['price']}</li>"
         
-        body += "<p>Happy snacking! 🤖</p>"
+        body += "</ul>"
+    
+    # Update subject line if anything is available
+    if any_available:
+        subject = "🎉 Bamba Alert: Now Available!"
+    
+    body += "<p>Happy snacking! 🤖</p>"
+    return subject, body, has_relevant_changes(changes, store_pref, size_pref), any_available
+
+def unsubscribe_footer(token):
+    # Use the URL of your Streamlit app
+    app_url = "https://bambot.streamlit.app/"
+    return f'<p style="color: #777; font-size: 0.8em; margin-top: 20px; border-top: 1px solid #ddd; padding-top: 10px;">Don\'t want these emails? <a href="{app_url}?token={token}">Unsubscribe</a></p>'
+
+def send_notifications(store_results, subscribers, state=None, config=None):
+    """Queue notifications for subscribers based on their preferences.
+    Each preference segment's body is rendered once; only the unsubscribe
+    footer is per recipient. Messages go into the outbox keyed by run and
+    recipient; returns how many were newly queued."""
+    
+    # Detect changes since each store's last check
+    changes = detect_changes(store_results, state or open_state())
+    run_ts  = store_results[0]["timestamp"] if store_results else get_awst_time().isoformat()
+    
+    # Unsubscribe tokens for everyone in one go (one prepared HMAC key)
+    try:
+        tokens = unsubscribe.generate_tokens({s["email"] for s in subscribers})
+    except Exception as e:
+        print(f"Error generating unsubscribe links: {e}")
+        tokens = {}
+    
+    segments, messages = {}, []
+    for subscriber in subscribers:
+        key = segment_key(subscriber)
+        if key not in segments:
+            segments[key] = render_segment(store_results, changes, key)
+        subject, body, relevant, urgent = segments[key]
         
-        # Add unsubscribe link
-        try:
-            from supabase_client import generate_unsubscribe_token
-            unsubscribe_token = generate_unsubscribe_token(subscriber["email"])
-            # Use the URL of your Streamlit app
-            app_url = "https://bambot.streamlit.app/"
-            body += f'<p style="color: #777; font-size: 0.8em; margin-top: 20px; border-top: 1px solid #ddd; padding-top: 10px;">Don\'t want these emails? <a href="{app_url}?token={unsubscribe_token}">Unsubscribe</a></p>'
-        except Exception as e:
-            print(f"Error generating unsubscribe link: {e}")
+        # Skip subscribers who want change notifications if nothing changed
+        if subscriber.get("notify_on_change_only", True) and not relevant:  # Default is now TRUE
+            continue
         
-        # Send the email
-        send_email(subscriber["email"], subject, body)
-        print(f"  ✉️ Consolidated email sent to {subscriber['email']}")
+        token  = tokens.get(subscriber["email"])
+        footer = unsubscribe_footer(token) if token else ""
+        messages.append(dispatcher.message(subscriber["email"], subject, body + footer, urgent,
+                                           key=f"alert:{run_ts}:{subscriber['email']}"))
+    if subscribers:
+        print(f"  🧩 Rendered {len(segments)} email bodies for {len(subscribers)} subscribers")
+    return outbox.enqueue(messages, config) if messages else 0
         
 # ─────────────────────────────────────────────────────────────
 # 8) MAIN
 # ─────────────────────────────────────────────────────────────
-def main():
+def publish_results(allr, subs, metrics, config=None):
+    """Queue notifications, record the run in history, the current state and
+    metrics, then deliver the queued emails."""
+    history = open_history(config)
+    state   = open_state(history, config)
+    # Queue consolidated notifications based on subscriber preferences;
+    # whatever happens there, the run is still recorded
+    with metrics.span("notify"):
+        try:
+            send_notifications(allr, subs, state, config)
+        except Exception as e:
+            print("⚠️ Notifications failed:", e)
+    
+    # Save results to history, then the state (replayed from history if we stop in between)
+    with metrics.span("history"):
+        append_history(allr, history)
+        state.update(allr)
+    
+    # Mail-server trouble only delays delivery: undelivered emails stay queued
+    with metrics.span("deliver"):
+        try:
+            outbox.deliver(config)
+        except Exception as e:
+            print("⚠️ Delivery failed; emails stay queued:", e)
+    metrics.write(config=config)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="One-shot Bamba availability checker")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="check stores concurrently (see 'async' in config.json)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="split stores across N local processes (default: sharding.workers)")
+    parser.add_argument("--shard", default=None, metavar="I/N",
+                        help="check only shard I of N and save results for --merge-shards")
+    parser.add_argument("--merge-shards", type=int, default=None, metavar="N",
+                        help="merge saved results of an N-way --shard split, then notify and save history")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep running with a warm browser, checking on the configured schedule")
+    parser.add_argument("--health-port", type=int, default=None,
+                        help="in --daemon mode, serve health JSON on this port")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    
     # Load config and check operating hours
     config = json.load(open("config.json"))
     
+    if args.daemon:
+        import checker_daemon
+        return checker_daemon.run(health_port=args.health_port)
+    
     # Check if we're within operating hours
     if not is_within_operating_hours(config):
         print(f"⏰ Outside operating hours. Current AWST time: {get_awst_time().strftime('%H:%M')}. Exiting.")
         sys.exit(0)  # Exit gracefully, not as an error
     
-    # Load subscribers
-    subs = load_subscribers()
+    # Load subscribers (not needed by a single shard)
+    subs = [] if args.shard else load_subscribers()
     
     # Check stores
-    allr = []
-    for store in STORES:
-        res = check_store(store)
-        allr.append(res)
-        time.sleep(random.uniform(2,5))  # Short delay for testing
-    
-    # Send consolidated notifications based on subscriber preferences
-    send_notifications(allr, subs)
+    stores  = load_stores(config)
+    metrics = RunMetrics()
+    workers = args.workers or config.get("sharding", {}).get("workers", 1)
+    if args.merge_shards:
+        allr, missing = sharding.merge_shard_results(stores, args.merge_shards)
+        if len(missing) == args.merge_shards:
+            print("🧩 No shard results to merge. Exiting.")
+            return
+        # A missing shard's stores weren't checked: record them as unknown
+        lost = [s for i in missing for s in sharding.shard_stores(stores, i, args.merge_shards)]
+        allr = sharding.order_results(stores, allr + [mark_unknown(new_result(s), "shard_missing") for s in lost])
+    else:
+        all_stores = stores
+        stores, skipped = schedule_stores(stores, config)
+        if not stores and not args.shard:
+            print("🗓️ No store is due yet. Exiting.")
+            return
+        if args.shard:
+            shard_index, shard_count = sharding.parse_shard(args.shard)
+            mine    = {s["name"] for s in sharding.shard_stores(all_stores, shard_index, shard_count)}
+            stores  = [s for s in stores if s["name"] in mine]
+            skipped = [r for r in skipped if r["store"] in mine]
+            print(f"🧩 Shard {shard_index}/{shard_count}: {', '.join(s['name'] for s in stores) or 'no stores'}")
+        if not stores:
+            allr = []
+        elif args.use_async or config.get("async", {}).get("enabled", False):
+            from async_checker import run_async
+            allr = run_async(stores, config, metrics)
+        elif workers > 1 and len(stores) > 1:
+            allr = sharding.check_stores_parallel(stores, config, workers, metrics)
+        else:
+            allr = check_stores(stores, config, metrics)
+        allr = sharding.order_results(all_stores, allr + skipped)
+        if args.shard:
+            sharding.write_shard_results(allr, shard_index, shard_count)
+            metrics.write(config=config)
+            return
     
-    # Save results to history
-    append_history(allr)
+    publish_results(allr, subs, metrics, config)
+    if args.merge_shards:
+        sharding.clear_shard_results(args.merge_shards)
     print("\n✅ Done.")
 
 if __name__=="__main__":
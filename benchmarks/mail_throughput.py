@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+SMTP throughput benchmark against a local stand-in server.
+The stand-in accepts everything and discards it; --handshake-ms delays its
+greeting to stand in for the TCP + STARTTLS + login round trips of a real
+provider, and --drop-every makes it hang up after that many messages so the
+reconnect path is exercised. Compares:
+– one connection per email (what each send_email used to do)
+– mailer.Mailer with one pooled session
+– mailer.Mailer with --pool sessions fed from as many threads
+
+    python benchmarks/mail_throughput.py --messages 300 --handshake-ms 80
+"""
+
+import os, sys, time, argparse, threading, socketserver
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mailer import Mailer, build_message
+
+HTML = "<h1>Bamba Status Update</h1>" + "<li><strong>Osem Bamba Peanut Snack</strong> (25g) - ✅ Available</li>" * 8
+
+class StandIn(socketserver.ThreadingTCPServer):
+    daemon_threads      = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_s, message_s, drop_every):
+        self.handshake_s = handshake_s
+        self.message_s   = message_s
+        self.drop_every  = drop_every
+        self.connections = 0
+        self.messages    = 0
+        self.lock        = threading.Lock()
+        super().__init__(("127.0.0.1", 0), SmtpHandler)
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.handshake_s)
+        self.reply("220 stand-in ESMTP")
+        received = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.split(b" ", 1)[0].strip().upper()
+            if verb == b"EHLO":
+                self.reply("250-stand-in"); self.reply("250 8BITMIME")
+            elif verb == b"DATA":
+                self.reply("354 go ahead")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                time.sleep(server.message_s)
+                received += 1
+                with server.lock:
+                    server.messages += 1
+                self.reply("250 queued")
+                if server.drop_every and received >= server.drop_every:
+                    return   # hang up without a word, like an idle-timeout
+            elif verb == b"QUIT":
+                self.reply("221 bye")
+                return
+            else:   # HELO, MAIL, RCPT, RSET, NOOP
+                self.reply("250 ok")
+
+def per_message(host, port, count):
+    """The old send_email: connect, send one message, quit."""
+    import smtplib
+    for i in range(count):
+        message = build_message("bot@example.com", f"user{i}@example.com", "🥜 Bamba Status Update", HTML)
+        with smtplib.SMTP(host, port) as s:
+            s.sendmail("bot@example.com", f"user{i}@example.com", message)
+
+def pooled(host, port, count, pool_size):
+    mailer = Mailer(host, port, user="", password="", from_email="bot@example.com",
+                    config={"mail": {"pool_size": pool_size, "starttls": False}})
+    send = lambda i: mailer.send(f"user{i}@example.com", "🥜 Bamba Status Update", HTML)
+    if pool_size == 1:
+        for i in range(count):
+            send(i)
+    else:
+        with ThreadPoolExecutor(pool_size) as pool:
+            list(pool.map(send, range(count)))
+    mailer.close()
+    return mailer.stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-email SMTP connections with the pooled mailer")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=80, help="connection setup cost to simulate")
+    parser.add_argument("--message-ms", type=float, default=2, help="server time per message")
+    parser.add_argument("--drop-every", type=int, default=0, help="server hangs up after this many messages")
+    parser.add_argument("--pool", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    server = StandIn(args.handshake_ms / 1000, args.message_ms / 1000, args.drop_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+
+    cases = [("one connection per email", lambda: per_message(host, port, args.messages)),
+             ("pooled, 1 session",        lambda: pooled(host, port, args.messages, 1)),
+             (f"pooled, {args.pool} sessions", lambda: pooled(host, port, args.messages, args.pool))]
+    print(f"{args.messages} messages, {args.handshake_ms:.0f} ms handshake, {args.message_ms:.0f} ms per message")
+    for name, fn in cases:
+        server.connections = server.messages = 0
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        print(f"{name:<28} {elapsed:7.2f} s  {args.messages / elapsed:7.1f} msg/s  "
+              f"{server.connections:>4} connections  {server.messages:>4} delivered")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for bamba_checker.
+Times, in fresh interpreters:
+– `import bamba_checker`
+– the outside-operating-hours exit of `bamba_checker.main()` (run against a
+  copy of config.json whose operating hours are empty)
+for the working tree and, with --ref, a git revision to compare against:
+
+    python benchmarks/startup.py --ref HEAD~1
+"""
+
+import os, sys, json, glob, shutil, argparse, statistics, subprocess, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_ONLY = "import bamba_checker"
+EARLY_EXIT  = "import bamba_checker, sys; sys.argv = ['bamba_checker.py']; bamba_checker.main()"
+
+def prepare_tree(dest, ref=None):
+    """Copy the checker's modules (working tree or `ref`) plus a closed-hours config."""
+    if ref:
+        archive = subprocess.run(["git", "-C", ROOT, "archive", ref], check=True, capture_output=True).stdout
+        subprocess.run(["tar", "-x", "-C", dest], input=archive, check=True)
+    else:
+        for path in glob.glob(os.path.join(ROOT, "*.py")) + [os.path.join(ROOT, "config.json")]:
+            shutil.copy(path, dest)
+    config_path = os.path.join(dest, "config.json")
+    config = json.load(open(config_path))
+    config["operating_hours"] = {"start": 0, "end": 0}
+    json.dump(config, open(config_path, "w"))
+
+def time_snippet(cwd, code, runs):
+    """Wall-clock seconds per run of `python -c code` in a new interpreter."""
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=cwd, check=False,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+def import_time_us(cwd):
+    """Cumulative `-X importtime` microseconds for bamba_checker itself."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_ONLY],
+                         cwd=cwd, capture_output=True, text=True).stderr
+    for line in out.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == "bamba_checker":
+            return int(parts[1])
+    return None
+
+def measure(label, cwd, runs):
+    time_snippet(cwd, EARLY_EXIT, 1)   # warm-up: write __pycache__ for the copied tree
+    baseline = statistics.median(time_snippet(cwd, "pass", runs))
+    row = {"tree": label, "importtime_ms": (import_time_us(cwd) or 0) / 1000}
+    for name, code in (("import", IMPORT_ONLY), ("early_exit", EARLY_EXIT)):
+        samples = time_snippet(cwd, code, runs)
+        row[name + "_ms"] = (statistics.median(samples) - baseline) * 1000
+    return row
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for bamba_checker")
+    parser.add_argument("--ref", default=None, help="git revision to compare against (e.g. HEAD~1)")
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    trees = [("working tree", None)] + ([(args.ref, args.ref)] if args.ref else [])
+    rows = []
+    for label, ref in trees:
+        with tempfile.TemporaryDirectory() as tmp:
+            prepare_tree(tmp, ref)
+            rows.append(measure(label, tmp, args.runs))
+
+    print(f"Median over {args.runs} fresh interpreters, minus bare interpreter start-up (ms)")
+    print(f"{'tree':<16}{'-X importtime':>15}{'import':>10}{'early exit':>12}")
+    for r in rows:
+        print(f"{r['tree']:<16}{r['importtime_ms']:>15.1f}{r['import_ms']:>10.1f}{r['early_exit_ms']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Unsubscribe-token benchmark: the old per-email Fernet token (a new Fernet
+object and an AES encryption per recipient, as supabase_client did) against
+unsubscribe.generate_tokens() for the whole list, plus verification of each.
+Uses FERNET_KEY from the environment, or a throwaway key.
+
+    python benchmarks/unsubscribe_tokens.py --recipients 5000
+"""
+
+import os, sys, time, argparse
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cryptography.fernet import Fernet
+
+def legacy_token(email):
+    """supabase_client.generate_unsubscribe_token before unsubscribe.py."""
+    message = f"{email}|{int(datetime.now().timestamp())}"
+    f = Fernet(os.getenv("FERNET_KEY").encode())
+    return f.encrypt(message.encode()).decode().replace('+', '-').replace('/', '_')
+
+def legacy_verify(token):
+    token = token.replace('-', '+').replace('_', '/')
+    f = Fernet(os.getenv("FERNET_KEY").encode())
+    email, _ = f.decrypt(token.encode()).decode().split('|')
+    return email
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare Fernet and HMAC unsubscribe tokens")
+    parser.add_argument("--recipients", type=int, default=5000)
+    args = parser.parse_args(argv)
+    os.environ.setdefault("FERNET_KEY", Fernet.generate_key().decode())
+    import unsubscribe
+
+    emails = [f"subscriber{i}@example.com" for i in range(args.recipients)]
+    old_gen, old_tokens = timed(lambda: [legacy_token(e) for e in emails])
+    new_gen, new_tokens = timed(lambda: unsubscribe.generate_tokens(emails))
+    old_ver, old_ok = timed(lambda: [legacy_verify(t) for t in old_tokens])
+    new_ver, new_ok = timed(lambda: [unsubscribe.verify_token(t) for t in new_tokens.values()])
+    compat, compat_ok = timed(lambda: [unsubscribe.verify_token(t) for t in old_tokens])
+    assert old_ok == emails and new_ok == emails and compat_ok == emails
+
+    n = args.recipients
+    print(f"{n} recipients")
+    print(f"{'':<26}{'generate':>12}{'verify':>12}{'token length':>14}")
+    print(f"{'Fernet per email':<26}{old_gen / n * 1e6:>9.1f} µs{old_ver / n * 1e6:>9.1f} µs"
+          f"{sum(map(len, old_tokens)) / n:>14.0f}")
+    print(f"{'HMAC, batch':<26}{new_gen / n * 1e6:>9.1f} µs{new_ver / n * 1e6:>9.1f} µs"
+          f"{sum(map(len, new_tokens.values())) / n:>14.0f}")
+    print(f"{'legacy links, new verify':<26}{'':>12}{compat / n * 1e6:>9.1f} µs")
+
+if __name__ == "__main__":
+    main()
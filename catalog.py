@@ -0,0 +1,189 @@
+"""
+Product catalog and compact history records.
+– split_name() / parse_price(): a product's size and numeric price, parsed
+  once at scrape time and stored on the product dict ("size", "price_cents").
+– Catalog: interns store and product names to small integer ids, persisted
+  next to the history log (history.catalog.json). Ids are never reused.
+– encode_run() / decode_run(): one run as
+    {"c": <run timestamp>, "r": [[store id, µs after "c", product ids,
+                                  availability bits, prices, extra], ...]}
+  where bit i of the availability int is product i, prices are integer
+  cents (or the raw text when it isn't a plain "$x.yz"), and extra holds
+  any other result fields (status, error, …).
+"""
+
+import os, re, json
+from datetime import datetime, timedelta
+
+PRICE_RE = re.compile(r"^\$(\d+)\.(\d\d)$")
+
+def split_name(name):
+    """'Osem Bamba Peanut Snack KB | 25g' → ('Osem Bamba Peanut Snack KB', '25g')."""
+    if "|" in name:
+        title, size = name.split("|", 1)
+        return title.strip(), size.strip()
+    return name, None
+
+def parse_price(text):
+    """'$2.00' → 200 cents; None when there is no (plain) price."""
+    m = PRICE_RE.match((text or "").strip())
+    return int(m.group(1)) * 100 + int(m.group(2)) if m else None
+
+def format_cents(cents):
+    return "n/a" if cents is None else f"${cents // 100}.{cents % 100:02d}"
+
+def describe(product):
+    """Add the parsed size and price to a scraped product dict."""
+    product["size"]        = split_name(product["name"])[1]
+    product["price_cents"] = parse_price(product["price"])
+    return product
+
+def product_size(product, default=None):
+    """The product's size, from the scrape-time field or (older records) its name."""
+    return product.get("size") or split_name(product["name"])[1] or default
+
+def product_title(product):
+    return split_name(product["name"])[0]
+
+# ─────────────────────────────────────────────────────────────
+# CATALOG
+# ─────────────────────────────────────────────────────────────
+class Catalog:
+    """Store and product names ↔ ids."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            data = json.load(open(path))
+        except FileNotFoundError:
+            data = {}
+        self.stores   = data.get("stores", [])
+        self.products = data.get("products", [])   # [{"name", "title", "size"}]
+        self._store_ids   = {name: i for i, name in enumerate(self.stores)}
+        self._product_ids = {p["name"]: i for i, p in enumerate(self.products)}
+        self.dirty = False
+
+    def store_id(self, name):
+        if name not in self._store_ids:
+            self._store_ids[name] = len(self.stores)
+            self.stores.append(name)
+            self.dirty = True
+        return self._store_ids[name]
+
+    def product_id(self, name):
+        if name not in self._product_ids:
+            title, size = split_name(name)
+            self._product_ids[name] = len(self.products)
+            self.products.append({"name": name, "title": title, "size": size})
+            self.dirty = True
+        return self._product_ids[name]
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"stores": self.stores, "products": self.products}, f, indent=1)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+# ─────────────────────────────────────────────────────────────
+# COMPACT RECORDS
+# ─────────────────────────────────────────────────────────────
+ROW_KEYS = ("store", "timestamp", "products")
+
+def _price(product):
+    cents = product["price_cents"] if "price_cents" in product else parse_price(product["price"])
+    return cents if format_cents(cents) == product["price"] else product["price"]
+
+def encode_run(run, catalog):
+    t0   = datetime.fromisoformat(run[0]["timestamp"])
+    rows = []
+    for entry in run:
+        products = entry.get("products", [])
+        bits = 0
+        for i, p in enumerate(products):
+            if p["available"]:
+                bits |= 1 << i
+        extra = {k: v for k, v in entry.items() if k not in ROW_KEYS}
+        if extra.get("available") == bool(bits):
+            del extra["available"]   # the usual case: derived from the bits
+        dt = round((datetime.fromisoformat(entry["timestamp"]) - t0) / timedelta(microseconds=1))
+        if (t0 + timedelta(microseconds=dt)).isoformat() != entry["timestamp"]:
+            extra["timestamp"] = entry["timestamp"]
+        row = [catalog.store_id(entry["store"]), dt,
+               [catalog.product_id(p["name"]) for p in products], bits,
+               [_price(p) for p in products]]
+        if extra:
+            row.append(extra)
+        rows.append(row)
+    return {"c": run[0]["timestamp"], "r": rows}
+
+_PRICE_TEXT = {}   # cents (or raw text) -> (price text, cents)
+
+def _price_fields(price):
+    if price not in _PRICE_TEXT:
+        if isinstance(price, str):
+            _PRICE_TEXT[price] = (price, parse_price(price))
+        else:
+            _PRICE_TEXT[price] = (format_cents(price), price)
+    return _PRICE_TEXT[price]
+
+def decode_run(record, catalog):
+    t0    = datetime.fromisoformat(record["c"])
+    info  = catalog.products
+    run   = []
+    for row in record["r"]:
+        store, dt, ids, bits, prices = row[:5]
+        extra    = dict(row[5]) if len(row) > 5 else {}
+        products = []
+        for i, pid in enumerate(ids):
+            text, cents = _price_fields(prices[i])
+            products.append({
+                "name":        info[pid]["name"],
+                "price":       text,
+                "available":   bool(bits >> i & 1),
+                "size":        info[pid]["size"],
+                "price_cents": cents,
+            })
+        entry = {
+            "store":     catalog.stores[store],
+            "timestamp": extra.pop("timestamp", None) or (t0 + timedelta(microseconds=dt)).isoformat(),
+            "available": extra.pop("available", bits != 0),
+            "products":  products,
+        }
+        entry.update(extra)
+        run.append(entry)
+    return run
+
+# ─────────────────────────────────────────────────────────────
+# CHART DATA
+# ─────────────────────────────────────────────────────────────
+def size_counts(run):
+    """(run timestamp, [(store, {size: [available, total]})]) from a full run.
+    Stores that weren't checked that run (errors, skipped, not due) are left out."""
+    stores = []
+    for entry in run:
+        if entry.get("status", "ok") != "ok":
+            continue
+        counts = {}
+        for p in entry.get("products", []):
+            c = counts.setdefault(product_size(p, "unknown"), [0, 0])
+            c[0] += bool(p["available"]); c[1] += 1
+        stores.append((entry["store"], counts))
+    return run[0]["timestamp"] if run else None, stores
+
+def record_size_counts(record, catalog):
+    """size_counts() straight from a compact record's availability bits."""
+    info   = catalog.products
+    stores = []
+    for row in record["r"]:
+        if len(row) > 5 and row[5].get("status", "ok") != "ok":
+            continue
+        ids, bits = row[2], row[3]
+        counts = {}
+        for i, pid in enumerate(ids):
+            c = counts.setdefault(info[pid]["size"] or "unknown", [0, 0])
+            c[0] += bits >> i & 1; c[1] += 1
+        stores.append((catalog.stores[row[0]], counts))
+    return record["c"], stores
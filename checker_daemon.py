@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Long-running checker (`python bamba_checker.py --daemon` or `python checker_daemon.py`).
+– Keeps the interpreter, Playwright driver and Chromium warm between runs.
+– Runs a check every `check_interval_minutes` (or, with adaptive scheduling,
+  wakes every `min_interval_minutes` and checks the stores that are due),
+  only within `operating_hours`; config.json is re-read before every run.
+– Writes daemon_health.json after every run and, with --health-port, serves
+  it over HTTP (200 while healthy, 503 when runs are failing or overdue).
+– SIGTERM / SIGINT finish the current run, then close the browser and exit.
+"""
+
+import os, sys, json, signal, argparse, threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import bamba_checker as bc
+
+HEALTH_FILE = "daemon_health.json"
+
+class Health:
+    """Status of the daemon, shared with the health endpoint thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {
+            "pid":                  os.getpid(),
+            "started_at":           bc.get_awst_time().isoformat(),
+            "state":                "starting",
+            "runs":                 0,
+            "consecutive_failures": 0,
+            "browser_launches":     0,
+            "last_run_started":     None,
+            "last_run_finished":    None,
+            "last_run_ok":          None,
+            "last_error":           None,
+            "next_run_at":          None,
+            "interval_minutes":     None,
+        }
+
+    def update(self, **changes):
+        with self.lock:
+            self.data.update(changes)
+            snapshot = dict(self.data)
+        tmp = HEALTH_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(tmp, HEALTH_FILE)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.data)
+
+    def healthy(self):
+        """Unhealthy after two failed runs in a row, or when a run is overdue/stuck."""
+        d   = self.snapshot()
+        now = bc.get_awst_time()
+        if d["consecutive_failures"] >= 2:
+            return False
+        if d["state"] == "running" and d["last_run_started"] and d["interval_minutes"]:
+            started = datetime.fromisoformat(d["last_run_started"])
+            return now - started < timedelta(minutes=2 * d["interval_minutes"])
+        if d["next_run_at"]:
+            return now < datetime.fromisoformat(d["next_run_at"]) + timedelta(minutes=10)
+        return True
+
+def serve_health(health, port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            ok   = health.healthy()
+            body = json.dumps({**health.snapshot(), "healthy": ok}).encode()
+            self.send_response(200 if ok else 503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="health", daemon=True).start()
+    print(f"🩺 Health endpoint on http://0.0.0.0:{port}/")
+    return server
+
+# ─────────────────────────────────────────────────────────────
+# SCHEDULING
+# ─────────────────────────────────────────────────────────────
+def next_opening(config, now):
+    """Next AWST datetime at which operating hours start."""
+    start = config["operating_hours"]["start"]
+    opening = now.replace(hour=start, minute=0, second=0, microsecond=0)
+    if opening <= now:
+        opening += timedelta(days=1)
+    return opening
+
+def seconds_until(when):
+    return max(0.0, (when - bc.get_awst_time()).total_seconds())
+
+class CheckerDaemon:
+    def __init__(self, config_path="config.json", health_port=None):
+        self.config_path = config_path
+        self.stop        = threading.Event()
+        self.health      = Health()
+        self.health_port = health_port
+        self.playwright  = None
+        self.browser     = None
+        self.pacer       = None
+
+    def load_config(self):
+        return json.load(open(self.config_path))
+
+    def request_stop(self, signum, frame):
+        print(f"\n🛑 Got signal {signum}; stopping after the current run…")
+        self.stop.set()
+
+    def ensure_browser(self, config, metrics):
+        """(Re)launch Chromium if it is not running; reused across runs."""
+        if self.browser is not None and self.browser.is_connected():
+            return self.browser
+        from playwright.sync_api import sync_playwright
+        if self.playwright is None:
+            self.playwright = sync_playwright().start()
+        self.pacer = bc.Pacer(config)
+        with metrics.span("launch"):
+            self.browser = bc.launch_browser(self.playwright, self.pacer)
+        self.health.update(browser_launches=self.health.snapshot()["browser_launches"] + 1)
+        print("🚀 Browser launched")
+        return self.browser
+
+    def run_once(self, config):
+        metrics = bc.RunMetrics()
+        started = bc.get_awst_time()
+        self.health.update(state="running", last_run_started=started.isoformat())
+        try:
+            all_stores = bc.load_stores(config)
+            stores, skipped = bc.schedule_stores(all_stores, config)
+            if not stores:
+                print("🗓️ No store is due yet.")
+                return
+            browser = self.ensure_browser(config, metrics)
+            shots   = bc.ScreenshotPolicy(config)
+            subs    = bc.load_subscribers()
+            try:
+                allr = bc.check_stores_on(browser, stores, config, self.pacer, metrics, shots)
+            finally:
+                shots.close()
+            allr = bc.sharding.order_results(all_stores, allr + skipped)
+            bc.publish_results(allr, subs, metrics, config)
+            print(self.pacer.report())
+            runs_ok = any(r.get("status", "ok") == "ok" for r in allr)
+            failures = 0 if runs_ok else self.health.snapshot()["consecutive_failures"] + 1
+            self.health.update(last_run_ok=runs_ok, consecutive_failures=failures, last_error=None)
+        except (Exception, SystemExit) as e:
+            print("⚠️ Run failed:", e or type(e).__name__)
+            self.close_browser()   # start from a clean browser next time
+            self.health.update(last_run_ok=False, last_error=str(e),
+                               consecutive_failures=self.health.snapshot()["consecutive_failures"] + 1)
+        finally:
+            self.health.update(runs=self.health.snapshot()["runs"] + 1,
+                               last_run_finished=bc.get_awst_time().isoformat())
+
+    def close_browser(self):
+        try:
+            if self.browser is not None:
+                self.browser.close()
+        except Exception:
+            pass
+        self.browser = None
+
+    def shutdown(self):
+        self.close_browser()
+        if self.playwright is not None:
+            self.playwright.stop()
+            self.playwright = None
+        self.health.update(state="stopped", next_run_at=None)
+        print("👋 Daemon stopped")
+
+    def serve(self):
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        if self.health_port:
+            serve_health(self.health, self.health_port)
+        print(f"🟢 Bamba checker daemon started (pid {os.getpid()})")
+        try:
+            while not self.stop.is_set():
+                config   = self.load_config()
+                interval = bc.scheduler.tick_minutes(config)
+                now      = bc.get_awst_time()
+                if bc.is_within_operating_hours(config):
+                    self.run_once(config)
+                    next_run = now + timedelta(minutes=interval)
+                else:
+                    # Nothing to do until opening; don't hold a browser overnight
+                    self.close_browser()
+                    next_run = next_opening(config, now)
+                self.health.update(state="idle" if bc.is_within_operating_hours(config) else "sleeping",
+                                   next_run_at=next_run.isoformat(), interval_minutes=interval)
+                print(f"⏳ Next run at {next_run.strftime('%Y-%m-%d %H:%M:%S AWST')}")
+                self.stop.wait(seconds_until(next_run))
+        finally:
+            self.shutdown()
+
+def run(health_port=None, config_path="config.json"):
+    CheckerDaemon(config_path, health_port).serve()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Bamba checker as a long-lived daemon")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--health-port", type=int, default=None)
+    args = parser.parse_args(argv)
+    run(health_port=args.health_port, config_path=args.config)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Structured-data extraction for Coles search results.
+– Coles search pages are Next.js: the server embeds the results as JSON in
+  <script id="__NEXT_DATA__">, and client-side navigation fetches the same
+  data from /_next/data/<build>/…/search/products.json.
+– Parsing that JSON gives the same product dicts as reading rendered tiles,
+  without waiting for (or interacting with) the DOM.
+– Offline harness: `python coles_payload.py FIXTURE [--expect EXPECTED]`.
+"""
+
+import os, re, sys, json, argparse
+
+NEXT_DATA_SELECTOR = "script#__NEXT_DATA__"
+NEXT_DATA_RE = re.compile(
+    r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+SEARCH_PAGE = "/search/products"
+
+class PayloadError(ValueError):
+    """The payload is not a Coles search result we know how to read."""
+
+# ─────────────────────────────────────────────────────────────
+# 1) PURE PARSING (used live and by the fixture harness)
+# ─────────────────────────────────────────────────────────────
+def search_results(payload):
+    """Find the searchResults block in __NEXT_DATA__ or a /_next/data response."""
+    if "props" in payload:
+        if payload.get("page") not in (None, SEARCH_PAGE):
+            raise PayloadError(f"payload is for page {payload.get('page')!r}, not search")
+        payload = payload["props"]
+    try:
+        return payload["pageProps"]["searchResults"]
+    except (KeyError, TypeError):
+        raise PayloadError("no pageProps.searchResults in payload")
+
+def format_price(pricing):
+    """Match the tile's price text: '$2.00', or 'n/a' when there is no price."""
+    now = (pricing or {}).get("now")
+    if now is None:
+        return "n/a"
+    return f"${float(now):.2f}"
+
+def item_to_product(item):
+    """One search result item → the product dict check_store records."""
+    title = " ".join(p for p in (item.get("brand"), item.get("name")) if p)
+    if item.get("size"):
+        title = f"{title} | {item['size']}"
+    return {
+        "name":      title or "Unknown",
+        "price":     format_price(item.get("pricing")),
+        "available": bool(item.get("availability")),
+    }
+
+def parse_search_payload(payload):
+    """All product dicts from a search payload, in page order."""
+    results = search_results(payload).get("results")
+    if not isinstance(results, list):
+        raise PayloadError("searchResults.results is missing")
+    return [item_to_product(r) for r in results if r.get("_type", "PRODUCT") == "PRODUCT"]
+
+def payload_from_html(html):
+    """Pull the __NEXT_DATA__ JSON out of a saved search page."""
+    m = NEXT_DATA_RE.search(html)
+    if not m:
+        raise PayloadError("no __NEXT_DATA__ script in page")
+    return json.loads(m.group(1))
+
+def load_fixture(path):
+    """Read a saved payload: raw JSON or a full HTML page."""
+    text = open(path, encoding="utf-8").read()
+    if text.lstrip().startswith("<"):
+        return payload_from_html(text)
+    return json.loads(text)
+
+# ─────────────────────────────────────────────────────────────
+# 2) LIVE CAPTURE (Playwright pages)
+# ─────────────────────────────────────────────────────────────
+def is_search_data_response(response):
+    url = response.url
+    return "/_next/data/" in url and SEARCH_PAGE in url
+
+class PayloadCapture:
+    """Remembers the search JSON the page fetches during client navigation.
+
+    Only the response object is kept in the event handler; the body is read
+    afterwards from the main flow.
+    """
+
+    def __init__(self):
+        self.responses = []
+
+    def on_response(self, response):
+        if is_search_data_response(response):
+            self.responses.append(response)
+
+    def attach(self, page):
+        page.on("response", self.on_response)
+        return self
+
+    def latest(self):
+        for response in reversed(self.responses):
+            try:
+                return response.json()
+            except Exception:
+                continue
+        return None
+
+def read_payload(page, capture=None):
+    """Best available search payload for the page currently loaded."""
+    fetched = capture.latest() if capture else None
+    if fetched is not None:
+        return fetched
+    raw = page.locator(NEXT_DATA_SELECTOR).text_content(timeout=5000)
+    return json.loads(raw)
+
+class AsyncPayloadCapture(PayloadCapture):
+    """PayloadCapture for playwright.async_api pages."""
+
+    async def latest(self):
+        for response in reversed(self.responses):
+            try:
+                return await response.json()
+            except Exception:
+                continue
+        return None
+
+async def read_payload_async(page, capture=None):
+    fetched = await capture.latest() if capture else None
+    if fetched is not None:
+        return fetched
+    raw = await page.locator(NEXT_DATA_SELECTOR).text_content(timeout=5000)
+    return json.loads(raw)
+
+def save_fixture(payload, store, folder):
+    """Keep a live payload so parsing can be re-checked offline later."""
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"search_{store['name'].lower()}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    return path
+
+# ─────────────────────────────────────────────────────────────
+# 3) FIXTURE HARNESS
+# ─────────────────────────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse a saved Coles search payload offline")
+    parser.add_argument("fixture", help="saved __NEXT_DATA__ JSON, /_next/data JSON or search page HTML")
+    parser.add_argument("--expect", help="JSON list of product dicts the fixture must produce")
+    args = parser.parse_args(argv)
+
+    products = parse_search_payload(load_fixture(args.fixture))
+    for p in products:
+        print(f"  {'✅' if p['available'] else '❌'} {p['name']} @ {p['price']}")
+    if args.expect:
+        expected = json.load(open(args.expect, encoding="utf-8"))
+        if products != expected:
+            print("❌ Parsed products differ from", args.expect)
+            print(json.dumps(products, indent=2))
+            return 1
+        print(f"✅ {len(products)} products match {args.expect}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
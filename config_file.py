@@ -0,0 +1,24 @@
+"""
+Shared access to config.json.
+– load_config(): the parsed file, or {} when there is none.
+– section(): one module's settings, its DEFAULT_SETTINGS overlaid with its
+  section of the config (each module's settings(config) is built on this).
+"""
+
+import json
+
+CONFIG_FILE = "config.json"
+
+def load_config(config=None, path=CONFIG_FILE):
+    """`config` if one was given, otherwise config.json ({} if it doesn't exist)."""
+    if config is not None:
+        return config
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def section(config, name, defaults):
+    """`defaults` with config[name] laid over it; a missing config or section gives the defaults."""
+    return {**defaults, **((config or {}).get(name) or {})}
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Current product state (current_state.json).
+– One entry per (store, product): availability, price, when availability last
+  changed and when it last came back in stock, as of the last successful check.
+– Change detection diffs a run against this instead of rebuilding the
+  previous state from history, so it costs the same however long history gets.
+– "as_of" is the timestamp of the last run applied. If the checker stopped
+  between appending a run to history and saving the state, the missing runs
+  are replayed from history the next time the state is opened; a missing
+  file is rebuilt from the whole history once.
+`python current_state.py` prints it, with time since each restock.
+"""
+
+import os, json, argparse
+from datetime import datetime
+
+from run_history import open_history, settings
+from config_file import load_config
+
+def _ok(entry):
+    return entry.get("status", "ok") == "ok"
+
+class StateIndex:
+    """(store, product) -> last known availability and price."""
+
+    def __init__(self, path="current_state.json"):
+        self.path = path
+        try:
+            data = json.load(open(path))
+        except FileNotFoundError:
+            data = {}
+        self.exists = bool(data)
+        self.as_of  = data.get("as_of")
+        self.stores = data.get("stores", {})   # store -> {"checked_at", "products": {name: {...}}}
+
+    def get(self, store, product):
+        """{"available", "price", "changed_at", "restocked_at"} from the store's
+        last successful check, or None if that check didn't list the product."""
+        known = self.stores.get(store, {}).get("products", {}).get(product)
+        return known if known and known.get("listed", True) else None
+
+    def apply(self, run):
+        """Fold one run's successful checks into the state (not saved)."""
+        for entry in run:
+            if not _ok(entry):
+                continue   # failed or not checked: nothing learned
+            ts    = entry["timestamp"]
+            known = self.stores.setdefault(entry["store"], {"checked_at": None, "products": {}})
+            known["checked_at"] = ts
+            listed = set()
+            for p in entry.get("products", []):
+                listed.add(p["name"])
+                old = self.get(entry["store"], p["name"])
+                if old is None or old["available"] != p["available"]:
+                    # Unlisted products keep their restock time
+                    restocked = known["products"].get(p["name"], {}).get("restocked_at")
+                    known["products"][p["name"]] = {"available": p["available"], "price": p["price"],
+                                                    "changed_at": ts,
+                                                    "restocked_at": ts if p["available"] else restocked}
+                else:
+                    old["price"] = p["price"]
+            for name, p in known["products"].items():
+                if name not in listed:
+                    p["listed"] = False   # reported as new if it comes back
+        if run:
+            self.as_of = max(self.as_of or "", run[0]["timestamp"])
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"as_of": self.as_of, "stores": self.stores}, f, indent=1)
+        os.replace(tmp, self.path)
+        self.exists = True
+
+    def update(self, run):
+        """Apply a run and write the state atomically."""
+        self.apply(run)
+        self.save()
+
+    def catch_up(self, history):
+        """Replay runs that reached history after as_of (all of it for a new file)."""
+        runs = [r for r in history.runs(since=self.as_of)
+                if r and (self.as_of is None or r[0]["timestamp"] > self.as_of)]
+        if not runs and self.exists:
+            return 0
+        for run in runs:
+            self.apply(run)
+        self.save()
+        if len(runs) > 1:
+            print(f"📇 Rebuilt {os.path.basename(self.path)} from {len(runs)} runs of history")
+        return len(runs)
+
+    def since_restock(self, store, product, now):
+        """Time since the product last came back in stock (None if it never has)."""
+        known = self.stores.get(store, {}).get("products", {}).get(product)
+        if not known or not known["restocked_at"]:
+            return None
+        return now - datetime.fromisoformat(known["restocked_at"])
+
+def open_state(history=None, config=None):
+    """The state index, brought up to date with the run history."""
+    config = load_config(config)
+    state = StateIndex(settings(config)["state_file"])
+    state.catch_up(history or open_history(config))
+    return state
+
+def format_age(delta):
+    """timedelta -> '3d 4h' / '5h 12m' / '7m'."""
+    minutes = int(delta.total_seconds() // 60)
+    days, hours = minutes // 1440, minutes // 60 % 24
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes % 60}m"
+    return f"{minutes}m"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the current product state")
+    parser.parse_args(argv)
+    from bamba_checker import get_awst_time
+    state = open_state()
+    now   = get_awst_time()
+    print(f"As of {state.as_of}")
+    for store, known in state.stores.items():
+        print(f"{store} (checked {known['checked_at'][:16]})")
+        for name, p in known["products"].items():
+            age = state.since_restock(store, name, now)
+            restock = f"restocked {format_age(age)} ago" if age is not None else "never restocked"
+            print(f"  {'✅' if p['available'] else '❌'} {name} {p['price']} – {restock}")
+
+if __name__ == "__main__":
+    main()
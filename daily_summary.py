@@ -3,10 +3,12 @@ from datetime import date
 import pytz
 from datetime import datetime
 from cryptography.fernet import Fernet
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
 import random
+from run_history import open_history
+from catalog import product_size, product_title
+import dispatcher
+import outbox
+import unsubscribe
 
 # ─── SETUP ───────────────────────────────────────────────────
 def get_awst_time():
@@ -35,7 +37,7 @@ def get_random_bamba_fact():
 
 # Try to use Supabase first, fall back to local file if not available
 try:
-    from supabase_client import get_subscribers, generate_unsubscribe_token
+    from supabase_client import get_subscribers
     use_supabase = True
     print("Using Supabase for subscribers")
 except ImportError:
@@ -46,38 +48,20 @@ except ImportError:
         print("⚠️ FERNET_KEY missing"); exit(1)
     f = Fernet(FERNET_KEY.encode())
 
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-SMTP_PORT   = int(os.getenv("SMTP_PORT", "587"))
-SMTP_USER   = os.getenv("SMTP_USER")
-SMTP_PASS   = os.getenv("SMTP_PASS")
-FROM_EMAIL  = os.getenv("FROM_EMAIL", SMTP_USER)
-
-def send_email(to, subj, html):
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subj
-    msg["From"]    = FROM_EMAIL
-    msg["To"]      = to
-    msg.attach(MIMEText(html, "html"))
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as s:
-        s.starttls()
-        s.login(SMTP_USER, SMTP_PASS)
-        s.sendmail(FROM_EMAIL, to, msg.as_string())
-    print("✉️ Sent to", to)
-
 # ─── BUILD OPTIMIZED SUMMARY ─────────────────────────────────
 def build_daily_summary():
     """Build optimized daily summary to avoid Gmail clipping."""
-    hist = json.load(open("history.json"))
+    history = open_history()
     today = get_awst_time().date().isoformat()
     
     # Try to get runs from today first
-    runs = [r for r in hist["runs"] if r and r[0]["timestamp"].startswith(today)]
+    runs = [r for r in history.runs(since=today) if r and r[0]["timestamp"].startswith(today)]
     
     # If no runs today, use the most recent runs instead
-    if not runs and hist["runs"]:
-        latest_run = hist["runs"][-1]
+    latest_run = history.latest()
+    if not runs and latest_run:
         latest_date = latest_run[0]["timestamp"].split("T")[0]
-        runs = [r for r in hist["runs"] if r and r[0]["timestamp"].startswith(latest_date)]
+        runs = [r for r in history.runs(since=latest_date) if r and r[0]["timestamp"].startswith(latest_date)]
     
     if not runs:
         print("No runs found in history."); exit(0)
@@ -110,10 +94,21 @@ def build_daily_summary():
     # Add store data compactly
     for store_data in latest_run:
         store_name = store_data["store"]
-        available_mark = "✅" if store_data["available"] else "❌"
+        not_due = store_data.get("error", {}).get("kind") == "not_due"
+        checked = store_data.get("status", "ok") == "ok" or not_due
+        available_mark = ("✅" if store_data["available"] else "❌") if checked else "❔"
         
         html += f"<div class='bamba-store'><h3 class='bamba-subheader'>{available_mark} {store_name}</h3>"
         
+        # Not due under adaptive scheduling: these are the last checked products
+        if not_due and store_data.get("last_checked"):
+            as_of = store_data["last_checked"].replace("T", " ")[:16]
+            html += f"<p>Not checked in the latest run – as of {as_of} AWST:</p>"
+        elif not checked:
+            # Errored, or skipped by the circuit breaker
+            html += "<p>Couldn't check this store – status unknown</p></div>"
+            continue
+        
         if not store_data["products"]:
             html += "<p>No products found</p></div>"
             continue
@@ -122,13 +117,8 @@ def build_daily_summary():
         html += "<ul style='margin:0;padding-left:20px'>"
         for product in store_data["products"]:
             # Get size and product name
-            if "|" in product["name"]:
-                product_name, size = product["name"].split("|", 1)
-                product_name = product_name.strip()
-                size = size.strip()
-            else:
-                product_name = product["name"]
-                size = "Unknown size"
+            product_name = product_title(product)
+            size = product_size(product, "Unknown size")
             
             # Set status with appropriate style
             status_class = "available" if product["available"] else "unavailable"
@@ -148,37 +138,53 @@ def build_daily_summary():
 # Build optimized email content
 main_html = build_daily_summary()
 
+SUBJECT = "🌰 Your Bamba Daily Roundup is here!"
+today    = get_awst_time().date().isoformat()
+messages = []
+
 # Send emails to subscribers
 if use_supabase:
     # Get daily subscribers
     daily_subscribers = get_subscribers(mode="daily")
     
+    # Render each segment (with or without a fact) once; only the
+    # unsubscribe link differs between recipients in a segment
+    segments = {}
+    
+    # Unsubscribe tokens for everyone in one go (one prepared HMAC key)
+    try:
+        tokens = unsubscribe.generate_tokens({sub["email"] for sub in daily_subscribers})
+    except Exception as e:
+        print(f"Error generating unsubscribe links: {e}")
+        tokens = {}
+    
     # Send to each subscriber with customizations
     for sub in daily_subscribers:
         try:
-            email_parts = []
-            
-            # Add Bamba fact if subscribed (before main content for better visibility)
-            if sub.get("include_facts", False):
-                fact = get_random_bamba_fact()
-                email_parts.append(f"<div class='bamba-fact'><h3>🌟 Bamba Fact of the Day</h3><p>{fact}</p></div>")
-            
-            # Add main content
-            email_parts.append(main_html)
+            include_facts = bool(sub.get("include_facts", False))
+            if include_facts not in segments:
+                email_parts = []
+                
+                # Add Bamba fact if subscribed (before main content for better visibility)
+                if include_facts:
+                    fact = get_random_bamba_fact()
+                    email_parts.append(f"<div class='bamba-fact'><h3>🌟 Bamba Fact of the Day</h3><p>{fact}</p></div>")
+                
+                # Add main content
+                email_parts.append(main_html)
+                segments[include_facts] = "".join(email_parts)
             
             # Add unsubscribe link
-            try:
-                unsubscribe_token = generate_unsubscribe_token(sub["email"])
+            footer = ""
+            if sub["email"] in tokens:
                 app_url = "https://bambot.streamlit.app/"
-                email_parts.append(f"<p style='color:#777;font-size:12px;margin-top:10px'>Don't want these emails? <a href='{app_url}?token={unsubscribe_token}'>Unsubscribe</a></p>")
-            except Exception as e:
-                print(f"Error generating unsubscribe link: {e}")
+                footer = f"<p style='color:#777;font-size:12px;margin-top:10px'>Don't want these emails? <a href='{app_url}?token={tokens[sub['email']]}'>Unsubscribe</a></p>"
             
-            # Send complete email
-            complete_html = "".join(email_parts)
-            send_email(sub["email"], "🌰 Your Bamba Daily Roundup is here!", complete_html)
+            # Queue complete email
+            messages.append(dispatcher.message(sub["email"], SUBJECT, segments[include_facts] + footer,
+                                               key=f"daily:{today}:{sub['email']}"))
         except Exception as e:
-            print(f"Error sending email to {sub.get('email', 'unknown')}: {e}")
+            print(f"Error preparing email for {sub.get('email', 'unknown')}: {e}")
 else:
     # Fall back to local file approach
     subfile = "subscribers.json"
@@ -188,8 +194,14 @@ else:
             if user.get("mode") == "daily":
                 try:
                     email = f.decrypt(user["token"].encode()).decode()
-                    send_email(email, "🌰 Your Bamba Daily Roundup is here!", main_html)
+                    messages.append(dispatcher.message(email, SUBJECT, main_html, key=f"daily:{today}:{email}"))
                 except Exception as e:
-                    print(f"Error sending to subscriber: {e}")
+                    print(f"Error reading subscriber: {e}")
     else:
         print("No subscribers.json file found.")
+
+# Queue in the outbox (one roundup per subscriber per day, however often this
+# runs), then deliver; failed sends are retried by the next drain
+if messages:
+    outbox.enqueue(messages)
+outbox.deliver()
@@ -0,0 +1,176 @@
+"""
+Parallel, rate-limited email delivery.
+– dispatch() sends a batch of messages from a thread pool with one worker per
+  pooled SMTP session (mail.pool_size), at most mail.max_per_second messages
+  per second in total.
+– Urgent messages ("now available" alerts) are queued ahead of the rest.
+– Errors are classified by classify():
+  – "server": connection, login, HELO or sender errors and sending-quota
+    replies. The batch stops, because every later message would fail the same
+    way. The failing message and everything not sent yet are deferred.
+  – "temporary": a 4xx reply to one message's RCPT or DATA. That message is
+    retried with backoff, up to mail.attempts times.
+  – "permanent": a 5xx reply to one message's RCPT or DATA. Only that
+    recipient fails.
+– Returns a DeliveryReport with sent / failed / retried / deferred counts and
+  percentiles of the time from dispatch until the server accepted each message.
+"""
+
+import time, random, threading
+
+from mailer import get_mailer
+from run_metrics import percentile
+
+class RateLimiter:
+    """At most `rate` acquisitions per second, spaced evenly across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at  = time.monotonic()
+        self.lock     = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            at  = max(self.next_at, now)
+            self.next_at = at + self.interval
+        time.sleep(at - now)
+
+class DeliveryReport:
+    """Outcome of one dispatch(); safe to update from the worker threads."""
+
+    def __init__(self):
+        self.lock      = threading.Lock()
+        self.sent      = 0
+        self.failed    = 0
+        self.retried   = 0
+        self.deferred  = 0
+        self.aborted   = None   # the server error that stopped the batch
+        self.latencies = []   # seconds from dispatch to accepted, per sent message
+        self.failures  = []   # (recipient, error)
+        self.outcomes  = []   # (message, exception or None), for the outbox
+        self.elapsed   = 0.0
+
+    def record_sent(self, m, latency):
+        with self.lock:
+            self.sent += 1
+            self.latencies.append(latency)
+            self.outcomes.append((m, None))
+
+    def record_retry(self):
+        with self.lock:
+            self.retried += 1
+
+    def record_failure(self, m, error):
+        with self.lock:
+            self.failed += 1
+            self.failures.append((m["to"], str(error)))
+            self.outcomes.append((m, error))
+
+    def record_deferred(self, m, error):
+        """Not sent because the server failed (`error`); left for a later drain."""
+        with self.lock:
+            self.deferred += 1
+            self.outcomes.append((m, error))
+
+    def abort(self, error):
+        with self.lock:
+            if self.aborted is None:
+                self.aborted = error
+
+    def to_dict(self):
+        lat = self.latencies
+        return {
+            "sent":      self.sent,
+            "failed":    self.failed,
+            "retried":   self.retried,
+            "deferred":  self.deferred,
+            "elapsed_s": round(self.elapsed, 3),
+            "p50_s":     round(percentile(lat, 50), 3) if lat else None,
+            "p95_s":     round(percentile(lat, 95), 3) if lat else None,
+            "max_s":     round(max(lat), 3) if lat else None,
+        }
+
+    def summary(self):
+        d = self.to_dict()
+        line = (f"📬 Delivered {d['sent']}/{d['sent'] + d['failed']} emails "
+                f"({d['failed']} failed, {d['retried']} retried) in {d['elapsed_s']:.1f}s")
+        if self.latencies:
+            line += f"; accepted after p50 {d['p50_s']:.2f}s, p95 {d['p95_s']:.2f}s, max {d['max_s']:.2f}s"
+        if self.aborted is not None:
+            line += f"\n⛔ Stopped on a mail server error ({self.aborted}); {d['deferred']} emails deferred"
+        return line
+
+QUOTA_MARKERS = ("5.4.5", "4.5.3", "quota", "limit exceeded", "rate limit")
+
+def _reply_text(exc):
+    text = getattr(exc, "smtp_error", b"")
+    return (text.decode(errors="replace") if isinstance(text, bytes) else str(text)).lower()
+
+def classify(exc):
+    """"server", "temporary" or "permanent" for an exception from Mailer.send()."""
+    import smtplib
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in exc.recipients.values()]
+        return "temporary" if codes and all(400 <= c < 500 for c in codes) else "permanent"
+    if isinstance(exc, (smtplib.SMTPAuthenticationError, smtplib.SMTPSenderRefused,
+                        smtplib.SMTPHeloError, smtplib.SMTPConnectError, smtplib.SMTPNotSupportedError)):
+        return "server"
+    if isinstance(exc, smtplib.SMTPResponseException):
+        if exc.smtp_code == 421 or any(m in _reply_text(exc) for m in QUOTA_MARKERS):
+            return "server"   # closing the session, or the account is over its sending quota
+        return "temporary" if 400 <= exc.smtp_code < 500 else "permanent"
+    if isinstance(exc, OSError):   # refused, reset, timed out, disconnected
+        return "server"
+    return "permanent"
+
+def message(to_email, subject, html_content, urgent=False, key=None):
+    """One email; `key` identifies it in the outbox (see outbox.py)."""
+    return {"to": to_email, "subject": subject, "html": html_content, "urgent": urgent, "key": key}
+
+def dispatch(messages, mailer=None, config=None):
+    """Send message() dicts (urgent ones first) and return a DeliveryReport."""
+    mailer  = mailer or get_mailer(config)
+    opts    = mailer.opts
+    limiter = RateLimiter(opts["max_per_second"])
+    report  = DeliveryReport()
+    queue   = sorted(messages, key=lambda m: not m["urgent"])   # stable: keeps the order otherwise
+    stop    = threading.Event()   # set on a server error: don't log in again for every message
+    started = time.monotonic()
+
+    def deliver(m):
+        for attempt in range(1, opts["attempts"] + 1):
+            if stop.is_set():
+                report.record_deferred(m, report.aborted)
+                return
+            limiter.wait()
+            try:
+                mailer.send(m["to"], m["subject"], m["html"])
+            except Exception as e:
+                kind = classify(e)
+                if kind == "server":
+                    report.abort(e)
+                    stop.set()
+                    report.record_deferred(m, e)
+                    print(f"  ⛔ Mail server error, stopping this batch: {e}")
+                    return
+                if attempt < opts["attempts"] and kind == "temporary":
+                    report.record_retry()
+                    time.sleep(opts["backoff_s"] * 2 ** (attempt - 1) * random.uniform(0.5, 1.0))
+                    continue
+                report.record_failure(m, e)
+                print(f"  ⚠️ Email to {m['to']} failed: {e}")
+                return
+            report.record_sent(m, time.monotonic() - started)
+            print(f"  ✉️ Email sent to {m['to']}")
+            return
+
+    if queue:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(opts["pool_size"], len(queue)),
+                                thread_name_prefix="mail") as pool:
+            list(pool.map(deliver, queue))   # the pool's work queue is FIFO
+    report.elapsed = time.monotonic() - started
+    return report
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+SQLite run history (history.backend = "sqlite").
+– Normalised tables: runs, stores, products, results (one row per store per
+  run) and observations (one row per product per result), indexed by store,
+  product and timestamp, so history can be kept indefinitely.
+– Same reading/writing interface as run_history.RunLog (including changes()
+  and size_counts()), plus a few queries for trend analysis:
+  store_history(), product_history(), availability_by_hour().
+– Products keep their parsed size and price_cents (see catalog.py); databases
+  made before those columns existed are upgraded when opened.
+– Imports the JSONL log (or a legacy history.json) the first time it is opened.
+`python history_db.py stats|product NAME [--store S] [--since DATE]`
+"""
+
+import os, json, sqlite3, argparse
+
+from catalog import split_name, parse_price
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stores (
+    id   INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS products (
+    id   INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    size TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    id         INTEGER PRIMARY KEY,
+    run_id     INTEGER NOT NULL REFERENCES runs(id),
+    position   INTEGER NOT NULL,
+    store_id   INTEGER NOT NULL REFERENCES stores(id),
+    ts         TEXT NOT NULL,
+    available  INTEGER NOT NULL,
+    status     TEXT,
+    error_step TEXT,
+    error_kind TEXT,
+    extra      TEXT
+);
+CREATE TABLE IF NOT EXISTS observations (
+    result_id  INTEGER NOT NULL REFERENCES results(id),
+    position   INTEGER NOT NULL,
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    price      TEXT,
+    available  INTEGER NOT NULL,
+    price_cents INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_ts             ON runs(ts);
+CREATE INDEX IF NOT EXISTS results_run         ON results(run_id);
+CREATE INDEX IF NOT EXISTS results_store_ts    ON results(store_id, ts);
+CREATE INDEX IF NOT EXISTS results_ts          ON results(ts);
+CREATE INDEX IF NOT EXISTS observations_result ON observations(result_id);
+CREATE INDEX IF NOT EXISTS observations_product ON observations(product_id, result_id);
+"""
+
+BASE_KEYS = {"store", "timestamp", "available", "products", "status", "error"}
+
+class SqliteHistory:
+    """Run history in an SQLite database."""
+
+    def __init__(self, path="history.db"):
+        self.path = path
+        self.db   = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self._upgrade()
+        self._ids = {"stores": {}, "products": {}}
+
+    def _upgrade(self):
+        """Add (and fill in) the size / price_cents columns on an older database."""
+        with self.db:
+            if "size" not in self._columns("products"):
+                self.db.execute("ALTER TABLE products ADD COLUMN size TEXT")
+                rows = self.db.execute("SELECT id, name FROM products").fetchall()
+                self.db.executemany("UPDATE products SET size = ? WHERE id = ?",
+                                    [(split_name(name)[1], id_) for id_, name in rows])
+            if "price_cents" not in self._columns("observations"):
+                self.db.execute("ALTER TABLE observations ADD COLUMN price_cents INTEGER")
+                prices = [row[0] for row in self.db.execute("SELECT DISTINCT price FROM observations")]
+                self.db.executemany("UPDATE observations SET price_cents = ? WHERE price IS ?",
+                                    [(parse_price(price), price) for price in prices])
+
+    def _columns(self, table):
+        return {row[1] for row in self.db.execute(f"PRAGMA table_info({table})")}
+
+    def close(self):
+        self.db.close()
+
+    def _id(self, table, name):
+        cache = self._ids[table]
+        if name not in cache:
+            if table == "products":   # size comes from the name, as in catalog.describe()
+                self.db.execute("INSERT OR IGNORE INTO products(name, size) VALUES (?, ?)", (name, split_name(name)[1]))
+            else:
+                self.db.execute(f"INSERT OR IGNORE INTO {table}(name) VALUES (?)", (name,))
+            cache[name] = self.db.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+        return cache[name]
+
+    # ─── writing ─────────────────────────────────────────────
+    def _insert(self, run):
+        ts = run[0]["timestamp"] if run else (self._last_ts() or "-")
+        run_id = self.db.execute("INSERT INTO runs(ts) VALUES (?)", (ts,)).lastrowid
+        for pos, entry in enumerate(run):
+            error = entry.get("error") or {}
+            extra = {k: v for k, v in entry.items() if k not in BASE_KEYS}
+            result_id = self.db.execute(
+                "INSERT INTO results(run_id, position, store_id, ts, available, status, error_step, error_kind, extra)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, pos, self._id("stores", entry["store"]), entry["timestamp"], int(entry["available"]),
+                 entry.get("status"), error.get("step"), error.get("kind"), json.dumps(extra) if extra else None),
+            ).lastrowid
+            self.db.executemany(
+                "INSERT INTO observations(result_id, position, product_id, price, available, price_cents)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(result_id, i, self._id("products", p["name"]), p.get("price"), int(p["available"]),
+                  p["price_cents"] if "price_cents" in p else parse_price(p.get("price")))
+                 for i, p in enumerate(entry.get("products", []))],
+            )
+
+    def append(self, run):
+        with self.db:
+            self._insert(run)
+
+    def import_runs(self, runs):
+        """Bulk-load runs (oldest first) in one transaction."""
+        count = 0
+        with self.db:
+            for run in runs:
+                self._insert(run)
+                count += 1
+        return count
+
+    def compact(self, keep_runs=None):
+        return 0   # retention is unbounded
+
+    # ─── reading ─────────────────────────────────────────────
+    def _last_ts(self):
+        row = self.db.execute("SELECT ts FROM runs ORDER BY id DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def _load(self, run_ids, chunk=500):
+        """Rebuild run lists (same shape as history.jsonl lines) for the given ids."""
+        runs = []
+        for i in range(0, len(run_ids), chunk):   # stay under SQLite's bound-parameter limit
+            runs.extend(self._load_chunk(run_ids[i:i + chunk]))
+        return runs
+
+    def _load_chunk(self, run_ids):
+        marks = ",".join("?" * len(run_ids))
+        results = {}
+        for rid, run_id, store, ts, available, status, step, kind, extra in self.db.execute(
+            f"SELECT r.id, r.run_id, s.name, r.ts, r.available, r.status, r.error_step, r.error_kind, r.extra"
+            f" FROM results r JOIN stores s ON s.id = r.store_id WHERE r.run_id IN ({marks})"
+            f" ORDER BY r.run_id, r.position", run_ids):
+            entry = {"store": store, "timestamp": ts, "available": bool(available), "products": []}
+            if status is not None:
+                entry["status"] = status
+            if step is not None or kind is not None:
+                entry["error"] = {"step": step, "kind": kind}
+            if extra:
+                entry.update(json.loads(extra))
+            results[rid] = (run_id, entry)
+        for rid, name, price, available, size, cents in self.db.execute(
+            f"SELECT o.result_id, p.name, o.price, o.available, p.size, o.price_cents FROM observations o"
+            f" JOIN products p ON p.id = o.product_id JOIN results r ON r.id = o.result_id"
+            f" WHERE r.run_id IN ({marks}) ORDER BY o.result_id, o.position", run_ids):
+            results[rid][1]["products"].append({"name": name, "price": price, "available": bool(available),
+                                                "size": size, "price_cents": cents})
+        runs = {run_id: [] for run_id in run_ids}
+        for run_id, entry in results.values():
+            runs[run_id].append(entry)
+        return [runs[run_id] for run_id in run_ids]
+
+    def _ids_where(self, where="", params=(), order="ASC", limit=None):
+        sql = f"SELECT id FROM runs {where} ORDER BY id {order}" + (f" LIMIT {int(limit)}" if limit else "")
+        return [row[0] for row in self.db.execute(sql, params)]
+
+    def latest(self):
+        runs = self._load(self._ids_where(order="DESC", limit=1))
+        return runs[0] if runs else None
+
+    def recent(self, n):
+        return self._load(self._ids_where(order="DESC", limit=n)[::-1])
+
+    def _range_ids(self, since=None, until=None, last=None):
+        clauses, params = [], []
+        if since:
+            clauses.append("ts >= ?"); params.append(since)
+        if until:
+            clauses.append("ts < ?"); params.append(until)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        if last:
+            return self._ids_where(where, params, order="DESC", limit=last)[::-1]
+        return self._ids_where(where, params)
+
+    def runs(self, since=None, until=None):
+        return self._load(self._range_ids(since, until))
+
+    def reversed_runs(self, batch=20):
+        ids = self._ids_where(order="DESC")
+        for i in range(0, len(ids), batch):
+            yield from self._load(ids[i:i + batch])
+
+    def changes(self, since=None, until=None):
+        """[(timestamp, store, product, change, price)] between consecutive successful checks."""
+        from run_history import diff_runs
+        ids = self._range_ids(since, until)
+        if since:   # the run before `since` is the baseline for the first one in range
+            ids = self._ids_where("WHERE ts < ?", (since,), order="DESC", limit=1) + ids
+        return diff_runs(self._load(ids), since)
+
+    def size_counts(self, since=None, until=None, last=None):
+        """Per-run, per-store available/total counts by size (the dashboard chart),
+        counted in SQL; stores that weren't checked are left out, as in catalog.size_counts()."""
+        ids, out = self._range_ids(since, until, last), []
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            runs  = {run_id: (ts, []) for run_id, ts in self.db.execute(
+                f"SELECT id, ts FROM runs WHERE id IN ({marks})", chunk)}
+            last_result = None
+            for run_id, rid, store, size, available, total in self.db.execute(
+                f"SELECT r.run_id, r.id, s.name, p.size, SUM(o.available), COUNT(o.product_id) FROM results r"
+                f" JOIN stores s ON s.id = r.store_id"
+                f" LEFT JOIN observations o ON o.result_id = r.id LEFT JOIN products p ON p.id = o.product_id"
+                f" WHERE r.run_id IN ({marks}) AND COALESCE(r.status, 'ok') = 'ok'"
+                f" GROUP BY r.id, p.size ORDER BY r.run_id, r.position", chunk):
+                stores = runs[run_id][1]
+                if rid != last_result:
+                    stores.append((store, {}))
+                    last_result = rid
+                if total:
+                    stores[-1][1][size or "unknown"] = [available, total]
+            out.extend(runs[run_id] for run_id in chunk)
+        return out
+
+    # ─── queries ─────────────────────────────────────────────
+    def store_history(self, store, since=None, until=None):
+        """[(timestamp, status, available)] for one store."""
+        sql = ("SELECT r.ts, COALESCE(r.status, 'ok'), r.available FROM results r"
+               " JOIN stores s ON s.id = r.store_id WHERE s.name = ?")
+        params = [store]
+        if since: sql += " AND r.ts >= ?"; params.append(since)
+        if until: sql += " AND r.ts < ?";  params.append(until)
+        return [(ts, status, bool(av)) for ts, status, av in self.db.execute(sql + " ORDER BY r.ts", params)]
+
+    def product_history(self, product, store=None, since=None, until=None):
+        """[(timestamp, store, available, price)] for one product, successful checks only."""
+        sql = ("SELECT r.ts, s.name, o.available, o.price FROM observations o"
+               " JOIN products p ON p.id = o.product_id JOIN results r ON r.id = o.result_id"
+               " JOIN stores s ON s.id = r.store_id"
+               " WHERE p.name = ? AND COALESCE(r.status, 'ok') = 'ok'")
+        params = [product]
+        if store: sql += " AND s.name = ?";  params.append(store)
+        if since: sql += " AND r.ts >= ?";   params.append(since)
+        if until: sql += " AND r.ts < ?";    params.append(until)
+        return [(ts, s, bool(av), price) for ts, s, av, price in self.db.execute(sql + " ORDER BY r.ts", params)]
+
+    def availability_by_hour(self, store=None, since=None):
+        """{hour: share of successful checks with anything available} (AWST hour)."""
+        sql = ("SELECT CAST(substr(r.ts, 12, 2) AS INTEGER), AVG(r.available) FROM results r"
+               " JOIN stores s ON s.id = r.store_id WHERE COALESCE(r.status, 'ok') = 'ok'")
+        params = []
+        if store: sql += " AND s.name = ?"; params.append(store)
+        if since: sql += " AND r.ts >= ?";  params.append(since)
+        return dict(self.db.execute(sql + " GROUP BY 1 ORDER BY 1", params).fetchall())
+
+    def products(self):
+        return [row[0] for row in self.db.execute("SELECT name FROM products ORDER BY name")]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the SQLite run history")
+    parser.add_argument("--db", default="history.db")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats")
+    prod = sub.add_parser("product", help="availability timeline of one product")
+    prod.add_argument("name")
+    prod.add_argument("--store", default=None)
+    prod.add_argument("--since", default=None, help="ISO date, e.g. 2026-09-01")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} not found (set history.backend to \"sqlite\" and run the checker)")
+    db = SqliteHistory(args.db)
+    if args.cmd == "stats":
+        latest = db.latest()
+        print(f"{len(db)} runs, {len(db.products())} products, {os.path.getsize(args.db)/1024:.1f} KB")
+        if latest:
+            print("latest run:", latest[0]["timestamp"])
+    if args.cmd == "product":
+        for ts, store, available, price in db.product_history(args.name, args.store, args.since):
+            print(f"{ts[:16]}  {store:<14} {'✅' if available else '❌'} {price}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Shared SMTP mailer for the checker, the daily summary and the app.
+– Keeps a small pool of connected, logged-in SMTP sessions and sends many
+  messages over each, instead of a connection, STARTTLS and login per email.
+– A session that has dropped (server hang-up, idle timeout) is replaced and
+  the message retried once on a fresh session. Sessions idle for longer than
+  idle_timeout_s are probed with NOOP before reuse. Each session is recycled
+  after messages_per_connection messages, because providers cap this.
+– Server and credentials come from the SMTP_* environment variables. Pool
+  tuning is under "mail" in config.json.
+`python benchmarks/mail_throughput.py` compares it with one connection per email.
+"""
+
+import os, time, queue, atexit, threading
+
+from config_file import load_config, section
+
+DEFAULT_SETTINGS = {
+    "pool_size":               2,     # concurrent sessions
+    "messages_per_connection": 100,
+    "idle_timeout_s":          60,
+    "starttls":                True,
+    "timeout_s":               30,
+    # dispatcher.py: one worker per session
+    "max_per_second":          10,
+    "attempts":                3,
+    "backoff_s":               2,
+}
+
+def settings(config):
+    return section(config, "mail", DEFAULT_SETTINGS)
+
+def build_message(from_email, to_email, subject, html_content):
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"]    = from_email
+    msg["To"]      = to_email
+    msg.attach(MIMEText(html_content, "html"))
+    return msg.as_string()
+
+class Session:
+    """One authenticated SMTP connection."""
+
+    def __init__(self, smtp):
+        self.smtp      = smtp
+        self.sent      = 0
+        self.last_used = time.monotonic()
+
+    def alive(self):
+        try:
+            return self.smtp.noop()[0] == 250
+        except OSError:
+            return False
+
+    def close(self):
+        try:
+            self.smtp.quit()
+        except OSError:
+            self.smtp.close()
+
+class Mailer:
+    """Pooled SMTP sessions; safe to share between threads."""
+
+    def __init__(self, host=None, port=None, user=None, password=None, from_email=None, config=None):
+        self.host       = host or os.getenv("SMTP_SERVER", "smtp.gmail.com")
+        self.port       = int(port or os.getenv("SMTP_PORT", "587"))
+        self.user       = user if user is not None else os.getenv("SMTP_USER")
+        self.password   = password if password is not None else os.getenv("SMTP_PASS")
+        self.from_email = from_email or os.getenv("FROM_EMAIL", self.user)
+        self.opts       = settings(config)
+        self._idle      = queue.LifoQueue()   # most recently used first: least likely to have timed out
+        self._slots     = threading.BoundedSemaphore(self.opts["pool_size"])
+        self._lock      = threading.Lock()
+        self.stats      = {"connections": 0, "reconnects": 0, "sent": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _connect(self):
+        import smtplib
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.opts["timeout_s"])
+        try:
+            if self.opts["starttls"]:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password)
+        except BaseException:
+            smtp.close()
+            raise
+        self._count("connections")
+        return Session(smtp)
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    session = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if time.monotonic() - session.last_used < self.opts["idle_timeout_s"] or session.alive():
+                    return session
+                session.close()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, session, broken=False):
+        if broken or session.sent >= self.opts["messages_per_connection"]:
+            session.close()
+        else:
+            session.last_used = time.monotonic()
+            self._idle.put(session)
+        self._slots.release()
+
+    def send(self, to_email, subject, html_content):
+        """Send one HTML email, retrying once on a fresh session if the connection dropped."""
+        import smtplib
+        message = build_message(self.from_email, to_email, subject, html_content)
+        for attempt in (1, 2):
+            session = self._acquire()
+            try:
+                session.smtp.sendmail(self.from_email, to_email, message)
+            except smtplib.SMTPRecipientsRefused:
+                self._release(session)   # the server said no; the session itself is fine
+                raise
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code != 421:   # 421: the server is closing the session
+                    self._release(session)
+                    raise
+                error = e
+            except OSError as e:         # disconnected, reset, timed out…
+                error = e
+            except BaseException:
+                self._release(session, broken=True)
+                raise
+            else:
+                session.sent += 1
+                self._release(session)
+                self._count("sent")
+                return
+            self._release(session, broken=True)
+            if attempt == 2:
+                raise error
+            self._count("reconnects")
+
+    def close(self):
+        """Log out of every idle session."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+_mailer      = None
+_mailer_lock = threading.Lock()
+
+def get_mailer(config=None):
+    """The process-wide mailer, created on first use and closed at exit."""
+    global _mailer
+    with _mailer_lock:
+        if _mailer is None:
+            config = load_config(config)
+            _mailer = Mailer(config=config)
+            atexit.register(_mailer.close)
+        return _mailer
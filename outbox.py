@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Durable email outbox (outbox.db, SQLite).
+– The checker and the daily summary enqueue their messages here (the app
+  sends its welcome email directly: nothing drains an outbox on its host). A message is only marked sent once the SMTP server has
+  accepted it, so nothing is lost if SMTP is down or a run stops halfway.
+– Every message has an idempotency key, e.g. "alert:<run timestamp>:<email>".
+  Enqueueing a key that is already there does nothing, so a re-run (or
+  re-merged shards) doesn't email anyone twice.
+– drain() delivers whatever is due through dispatcher.py. After a temporary
+  failure a message waits retry_base_s, doubling up to retry_max_s, and is
+  given up after max_attempts drains. A permanent failure (5xx to its RCPT
+  or DATA) fails it straight away. A server failure (connection, login,
+  sender or quota) stops the drain: the messages stay pending for
+  retry_base_s without using up an attempt. A message left "sending" by a
+  drain that died is picked up again after stale_sending_s.
+`python outbox.py drain|stats|retry-failed|purge`. Configured under "outbox" in config.json.
+"""
+
+import time, sqlite3, argparse
+
+import dispatcher
+from config_file import load_config, section
+
+DEFAULT_SETTINGS = {
+    "file":            "outbox.db",
+    "drain_after_run": True,   # the checker / daily summary deliver right after enqueueing
+    "max_attempts":    8,
+    "retry_base_s":    60,
+    "retry_max_s":     3600,
+    "stale_sending_s": 600,
+    "keep_sent_days":  7,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id              INTEGER PRIMARY KEY,
+    key             TEXT NOT NULL UNIQUE,
+    recipient       TEXT NOT NULL,
+    subject         TEXT NOT NULL,
+    html            TEXT NOT NULL,
+    urgent          INTEGER NOT NULL DEFAULT 0,
+    status          TEXT NOT NULL DEFAULT 'pending',   -- pending / sending / sent / failed
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,                     -- while sending: when it was claimed
+    created_at      REAL NOT NULL,
+    sent_at         REAL,
+    last_error      TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox(status, next_attempt_at);
+"""
+
+def settings(config):
+    return section(config, "outbox", DEFAULT_SETTINGS)
+
+class Outbox:
+    """Messages waiting to be (re)sent."""
+
+    def __init__(self, path="outbox.db", config=None):
+        self.path = path
+        self.opts = settings(config)
+        self.db   = sqlite3.connect(path, timeout=30)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def enqueue(self, messages):
+        """Store dispatcher.message() dicts that have a "key"; returns how many were new."""
+        now = time.time()
+        with self.db:
+            before = self.db.total_changes
+            self.db.executemany(
+                "INSERT OR IGNORE INTO outbox(key, recipient, subject, html, urgent, next_attempt_at, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(m["key"], m["to"], m["subject"], m["html"], int(m["urgent"]), now, now) for m in messages])
+            return self.db.total_changes - before
+
+    def _claim(self, limit=None):
+        """Mark due messages as sending and return them (urgent first)."""
+        now   = time.time()
+        stale = now - self.opts["stale_sending_s"]
+        with self.db:
+            rows = self.db.execute(
+                "SELECT id, key, recipient, subject, html, urgent, attempts FROM outbox"
+                " WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'sending' AND next_attempt_at < ?)"
+                " ORDER BY urgent DESC, id" + (f" LIMIT {int(limit)}" if limit else ""), (now, stale)).fetchall()
+            self.db.executemany("UPDATE outbox SET status = 'sending', next_attempt_at = ? WHERE id = ?",
+                                [(now, row[0]) for row in rows])
+        return [{**dispatcher.message(to, subject, html, bool(urgent), key), "id": id_, "attempts": attempts}
+                for id_, key, to, subject, html, urgent, attempts in rows]
+
+    def _record(self, outcomes):
+        now, updates = time.time(), []
+        for m, error in outcomes:
+            attempts = m["attempts"] + 1
+            kind     = dispatcher.classify(error) if error is not None else None
+            if error is None:
+                updates.append(("sent", attempts, now, now, None, m["id"]))
+            elif kind == "server":   # not this message's fault: try again later, attempt not counted
+                updates.append(("pending", m["attempts"], now + self.opts["retry_base_s"], None, str(error), m["id"]))
+            elif kind == "temporary" and attempts < self.opts["max_attempts"]:
+                wait = min(self.opts["retry_base_s"] * 2 ** (attempts - 1), self.opts["retry_max_s"])
+                updates.append(("pending", attempts, now + wait, None, str(error), m["id"]))
+            else:
+                updates.append(("failed", attempts, now, None, str(error), m["id"]))
+        with self.db:
+            self.db.executemany("UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?,"
+                                " sent_at = ?, last_error = ? WHERE id = ?", updates)
+
+    def drain(self, mailer=None, config=None, limit=None):
+        """Send everything that is due; returns the DeliveryReport."""
+        messages = self._claim(limit)
+        report   = dispatcher.dispatch(messages, mailer, config)
+        self._record(report.outcomes)
+        return report
+
+    def stats(self):
+        return dict(self.db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+    def retry_failed(self):
+        with self.db:
+            return self.db.execute("UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ?"
+                                   " WHERE status = 'failed'", (time.time(),)).rowcount
+
+    def purge(self, days=None):
+        """Forget sent messages (and their keys) older than keep_sent_days."""
+        cutoff = time.time() - 86400 * (days if days is not None else self.opts["keep_sent_days"])
+        with self.db:
+            return self.db.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (cutoff,)).rowcount
+
+def open_outbox(config=None):
+    config = load_config(config)
+    return Outbox(settings(config)["file"], config)
+
+def enqueue(messages, config=None):
+    """Queue messages; returns how many weren't queued already."""
+    box = open_outbox(config)
+    try:
+        new = box.enqueue(messages)
+    finally:
+        box.close()
+    if new < len(messages):
+        print(f"📮 {len(messages) - new} of {len(messages)} emails were already queued")
+    return new
+
+def deliver(config=None):
+    """Drain the outbox now, unless drain_after_run is off (then the
+    separate `python outbox.py drain` step delivers)."""
+    box = open_outbox(config)
+    try:
+        if not box.opts["drain_after_run"]:
+            return None
+        report = box.drain(config=config)
+        box.purge()
+    finally:
+        box.close()
+    if report.sent or report.failed:
+        print(report.summary())
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deliver or inspect queued emails")
+    parser.add_argument("cmd", choices=["drain", "stats", "retry-failed", "purge"])
+    parser.add_argument("--limit", type=int, default=None, help="for drain: at most this many messages")
+    args = parser.parse_args(argv)
+    box = open_outbox()
+    if args.cmd == "drain":
+        report = box.drain(limit=args.limit)
+        print(report.summary())
+    if args.cmd == "retry-failed":
+        print(f"Re-queued {box.retry_failed()} failed messages")
+    if args.cmd == "purge":
+        print(f"Purged {box.purge()} sent messages")
+    print("📮 Outbox:", ", ".join(f"{n} {status}" for status, n in sorted(box.stats().items())) or "empty")
+    box.close()
+
+if __name__ == "__main__":
+    main()
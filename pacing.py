@@ -0,0 +1,105 @@
+"""
+Pacing for the scrapers – how long to wait between browser actions.
+– "fast":   no sleeps; waits only on readiness signals (network idle,
+            Playwright's own auto-waiting for selectors).
+– "polite": readiness signals plus a small, bounded random jitter.
+– "legacy": the original slow_mo=100 + 0.5–1.5s human_delay + 2–5s between
+            stores, for when Coles starts pushing back.
+Chosen with "pacing": {"profile": …} in config.json; any profile field can
+be overridden there too. Keeps a tally of time slept vs. time spent waiting
+on the page so each run can report it.
+"""
+
+import time, random
+
+PROFILES = {
+    "fast": {
+        "slow_mo":            0,
+        "jitter_ms":          [0, 0],
+        "between_stores_s":   [0, 0],
+        "settle":             "networkidle",
+        "settle_timeout_ms":  5000,
+    },
+    "polite": {
+        "slow_mo":            0,
+        "jitter_ms":          [200, 800],
+        "between_stores_s":   [0.5, 2],
+        "settle":             "networkidle",
+        "settle_timeout_ms":  5000,
+    },
+    "legacy": {
+        "slow_mo":            100,
+        "jitter_ms":          [500, 1500],
+        "between_stores_s":   [2, 5],
+        "settle":             None,
+        "settle_timeout_ms":  0,
+    },
+}
+DEFAULT_PROFILE = "polite"
+
+class Pacer:
+    """Applies one pacing profile and accounts for where the time went."""
+
+    def __init__(self, config=None):
+        settings = dict((config or {}).get("pacing") or {})
+        self.profile = settings.pop("profile", DEFAULT_PROFILE)
+        if self.profile not in PROFILES:
+            print(f"⚠️ Unknown pacing profile {self.profile!r}; using {DEFAULT_PROFILE}")
+            self.profile = DEFAULT_PROFILE
+        self.settings = {**PROFILES[self.profile], **settings}
+        self.slow_mo  = self.settings["slow_mo"]
+        self.slept    = 0.0   # seconds of deliberate sleep
+        self.settled  = 0.0   # seconds waiting on readiness signals
+        self.started  = time.monotonic()
+
+    def browser_options(self, base):
+        return {**base, "slow_mo": self.slow_mo}
+
+    def _jitter(self):
+        lo, hi = self.settings["jitter_ms"]
+        return random.uniform(lo/1000, hi/1000) if hi > 0 else 0.0
+
+    def _between(self):
+        lo, hi = self.settings["between_stores_s"]
+        return random.uniform(lo, hi) if hi > 0 else 0.0
+
+    # ─── sync API ────────────────────────────────────────────
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+            self.slept += seconds
+
+    def pause(self, page=None):
+        """Replacement for human_delay(): settle the page, then jitter."""
+        if page is not None and self.settings["settle"]:
+            t0 = time.monotonic()
+            try: page.wait_for_load_state(self.settings["settle"], timeout=self.settings["settle_timeout_ms"])
+            except Exception: pass
+            self.settled += time.monotonic() - t0
+        self.sleep(self._jitter())
+
+    def between_stores(self):
+        self.sleep(self._between())
+
+    # ─── async API ───────────────────────────────────────────
+    async def asleep(self, seconds):
+        import asyncio   # only the async checker gets here, with asyncio already loaded
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+            self.slept += seconds
+
+    async def apause(self, page=None):
+        if page is not None and self.settings["settle"]:
+            t0 = time.monotonic()
+            try: await page.wait_for_load_state(self.settings["settle"], timeout=self.settings["settle_timeout_ms"])
+            except Exception: pass   # CancelledError is not an Exception, so it still propagates
+            self.settled += time.monotonic() - t0
+        await self.asleep(self._jitter())
+
+    # ─── reporting ───────────────────────────────────────────
+    def report(self):
+        total = time.monotonic() - self.started
+        pct = 100 * self.slept / total if total else 0
+        return (f"💤 Pacing '{self.profile}': slept {self.slept:.1f}s of {total:.1f}s ({pct:.0f}%), "
+                f"{self.settled:.1f}s waiting on page readiness, "
+                f"{max(total - self.slept - self.settled, 0):.1f}s working")
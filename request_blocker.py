@@ -0,0 +1,117 @@
+"""
+Request interception for scraping sessions.
+– Aborts requests by resource type (images, fonts, media…) and by domain.
+– Rules come from "request_blocking" in config.json.
+– Keeps per-store counters so each check can report what it saved.
+"""
+
+from urllib.parse import urlsplit
+
+DEFAULT_RULES = {
+    "enabled": True,
+    # Playwright resource types: document, stylesheet, image, media, font,
+    # script, texttrack, xhr, fetch, eventsource, websocket, manifest, other
+    "resource_types": ["image", "media", "font"],
+    # Always blocked (analytics, ads, session replay…)
+    "deny_domains": [],
+    # When non-empty, anything outside these domains is blocked too
+    "allow_domains": [],
+}
+
+# Blocked requests never download, so their size is unknown; these are rough
+# per-type averages for the Coles site used to estimate what was saved.
+TYPICAL_BYTES = {
+    "image":      40_000,
+    "media":     500_000,
+    "font":       30_000,
+    "script":     60_000,
+    "stylesheet": 20_000,
+}
+DEFAULT_TYPICAL_BYTES = 5_000
+
+# Never block the page itself, whatever the rules say.
+NEVER_BLOCK = {"document"}
+
+def _host_matches(host, domains):
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+class RequestBlocker:
+    """Route handler that aborts unwanted requests and counts them."""
+
+    def __init__(self, rules=None):
+        rules = {**DEFAULT_RULES, **(rules or {})}
+        self.enabled        = rules["enabled"]
+        self.resource_types = set(rules["resource_types"])
+        self.deny_domains   = [d.lower().lstrip(".") for d in rules["deny_domains"]]
+        self.allow_domains  = [d.lower().lstrip(".") for d in rules["allow_domains"]]
+        self.allowed        = 0
+        self.blocked        = 0
+        self.blocked_bytes  = 0
+        self.by_reason      = {}
+
+    def reason_to_block(self, url, resource_type):
+        """Return why a request should be aborted, or None to let it through."""
+        if not self.enabled or resource_type in NEVER_BLOCK:
+            return None
+        host = (urlsplit(url).hostname or "").lower()
+        if not host:
+            return None
+        if self.allow_domains and not _host_matches(host, self.allow_domains):
+            return "not_allowed"
+        if _host_matches(host, self.deny_domains):
+            return "denied_domain"
+        if resource_type in self.resource_types:
+            return resource_type
+        return None
+
+    def _record(self, reason, resource_type):
+        if reason is None:
+            self.allowed += 1
+            return False
+        self.blocked += 1
+        self.blocked_bytes += TYPICAL_BYTES.get(resource_type, DEFAULT_TYPICAL_BYTES)
+        self.by_reason[reason] = self.by_reason.get(reason, 0) + 1
+        return True
+
+    # ─── sync API ────────────────────────────────────────────
+    def handle(self, route):
+        req = route.request
+        if self._record(self.reason_to_block(req.url, req.resource_type), req.resource_type):
+            route.abort()
+        else:
+            route.continue_()
+
+    def attach(self, ctx):
+        """Install on a (sync) browser context; covers every page it opens."""
+        if self.enabled:
+            ctx.route("**/*", self.handle)
+        return self
+
+    # ─── async API ───────────────────────────────────────────
+    async def handle_async(self, route):
+        req = route.request
+        if self._record(self.reason_to_block(req.url, req.resource_type), req.resource_type):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def attach_async(self, ctx):
+        if self.enabled:
+            await ctx.route("**/*", self.handle_async)
+        return self
+
+    # ─── reporting ───────────────────────────────────────────
+    def stats(self):
+        return {
+            "allowed":           self.allowed,
+            "blocked":           self.blocked,
+            "est_bytes_saved":   self.blocked_bytes,
+            "blocked_by_reason": dict(self.by_reason),
+        }
+
+    def summary(self):
+        if not self.enabled:
+            return "request blocking off"
+        reasons = ", ".join(f"{k}={v}" for k, v in sorted(self.by_reason.items())) or "none"
+        return (f"blocked {self.blocked}/{self.blocked + self.allowed} requests "
+                f"(~{self.blocked_bytes/1024:.0f} KB saved; {reasons})")
@@ -0,0 +1,169 @@
+"""
+Failure handling for store checks.
+– classify_failure(): timeout / navigation / selector / closed / unknown.
+– retry_call() / aretry_call(): bounded retries with exponential backoff for
+  the navigation steps, only for failures worth retrying.
+– CircuitBreaker: per-store failure counts persisted in circuit_state.json;
+  a store that keeps failing is skipped (recorded as "unknown") until its
+  cooldown expires.
+Configured under "resilience" in config.json.
+"""
+
+import os, json, time, random
+from contextlib import contextmanager
+
+from config_file import section
+
+STATE_FILE = "circuit_state.json"
+RETRYABLE  = {"timeout", "navigation"}
+
+DEFAULT_SETTINGS = {
+    "goto_timeout_ms":   30000,
+    "attempts":          2,
+    "backoff_s":         2,
+    "max_backoff_s":     10,
+    "failure_threshold": 3,
+    "cooldown_minutes":  120,
+}
+
+def settings(config):
+    return section(config, "resilience", DEFAULT_SETTINGS)
+
+def classify_failure(exc):
+    """Bucket an exception from a Playwright step into a failure kind."""
+    name = type(exc).__name__
+    msg  = str(exc)
+    if name == "TimeoutError":   # Playwright's, asyncio's (3.10) and the builtin
+        # Playwright raises TimeoutError for both slow pages and missing selectors
+        if "waiting for locator" in msg or "waiting for selector" in msg or "wait_for_selector" in msg:
+            return "selector"
+        return "timeout"
+    if "net::ERR_" in msg or "NS_ERROR_" in msg or "Navigation failed" in msg:
+        return "navigation"
+    if "Target page, context or browser has been closed" in msg or "Target closed" in msg:
+        return "closed"
+    return "unknown"
+
+def _backoff(attempt, opts):
+    delay = min(opts["backoff_s"] * (2 ** attempt), opts["max_backoff_s"])
+    return delay * random.uniform(0.5, 1.0)
+
+def retry_call(fn, step, opts, label=""):
+    """Call fn(); retry retryable failures up to opts['attempts'] times in total."""
+    for attempt in range(opts["attempts"]):
+        try:
+            return fn()
+        except Exception as e:
+            kind = classify_failure(e)
+            if kind not in RETRYABLE or attempt + 1 >= opts["attempts"]:
+                raise
+            delay = _backoff(attempt, opts)
+            print(f"  🔁 {label}{step} failed ({kind}); retry {attempt + 2}/{opts['attempts']} in {delay:.1f}s")
+            time.sleep(delay)
+
+async def aretry_call(fn, step, opts, label=""):
+    """Async twin of retry_call(); fn returns an awaitable."""
+    import asyncio
+    for attempt in range(opts["attempts"]):
+        try:
+            return await fn()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            kind = classify_failure(e)
+            if kind not in RETRYABLE or attempt + 1 >= opts["attempts"]:
+                raise
+            delay = _backoff(attempt, opts)
+            print(f"  🔁 {label}{step} failed ({kind}); retry {attempt + 2}/{opts['attempts']} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+def mark_failed(result, step, exc):
+    """Record a classified failure on a store result dict."""
+    result["status"] = "error"
+    result["error"]  = {"step": step, "kind": classify_failure(exc)}
+    return result
+
+def mark_unknown(result, reason):
+    """Store was not checked this run; its availability is unknown."""
+    result["status"] = "unknown"
+    result["error"]  = {"step": "skipped", "kind": reason}
+    return result
+
+# ─────────────────────────────────────────────────────────────
+# CIRCUIT BREAKER
+# ─────────────────────────────────────────────────────────────
+class CircuitBreaker:
+    """Skips stores that failed `failure_threshold` runs in a row, for a cooldown."""
+
+    def __init__(self, config=None, path=STATE_FILE):
+        opts = settings(config)
+        self.threshold = opts["failure_threshold"]
+        self.cooldown  = opts["cooldown_minutes"] * 60
+        self.path      = path
+        self.touched   = set()
+        try:
+            self.state = json.load(open(path))
+        except (FileNotFoundError, ValueError):
+            self.state = {}
+
+    def allow(self, store):
+        entry = self.state.get(store["name"])
+        if not entry or entry.get("open_until", 0) <= time.time():
+            return True
+        mins = (entry["open_until"] - time.time()) / 60
+        print(f"  🔌 Skipping {store['name']}: {entry['failures']} failures in a row "
+              f"(last: {entry.get('last_kind')} at {entry.get('last_step')}), retry in {mins:.0f} min")
+        return False
+
+    def record(self, result):
+        """Update the store's entry from a finished result dict."""
+        name   = result["store"]
+        status = result.get("status", "ok")
+        if status == "unknown":
+            return
+        self.touched.add(name)
+        if status == "ok":
+            self.state.pop(name, None)
+            return
+        entry = self.state.setdefault(name, {"failures": 0})
+        entry["failures"] += 1
+        entry["last_kind"] = result.get("error", {}).get("kind")
+        entry["last_step"] = result.get("error", {}).get("step")
+        entry["last_failure"] = time.time()
+        if entry["failures"] >= self.threshold:
+            entry["open_until"] = time.time() + self.cooldown
+            print(f"  🔌 Circuit open for {name} for {self.cooldown/60:.0f} min")
+
+    def save(self):
+        """Write back only the stores this process touched (shards share the file).
+        The read-merge-write runs under a lock so concurrent workers don't drop
+        each other's updates."""
+        with _locked(self.path + ".lock"):
+            try:
+                on_disk = json.load(open(self.path))
+            except (FileNotFoundError, ValueError):
+                on_disk = {}
+            for name in self.touched:
+                if name in self.state:
+                    on_disk[name] = self.state[name]
+                else:
+                    on_disk.pop(name, None)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(on_disk, f, indent=2)
+            os.replace(tmp, self.path)
+
+@contextmanager
+def _locked(path):
+    """Exclusive advisory lock on `path` (POSIX; elsewhere no lock is taken)."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
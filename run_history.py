@@ -0,0 +1,619 @@
+#!/usr/bin/env python3
+"""
+Append-only run history.
+– history.jsonl: one JSON line per run. With encoding "compact" (the
+  default) each line is a self-contained compact record that refers to
+  stores and products by id (catalog.py, history.catalog.json). With
+  "delta", every snapshot_every-th line is a full snapshot and the lines in
+  between hold only what changed since the previous run. "full" writes the
+  plain list of per-store results. Readers rebuild runs on demand and cache
+  them; logs mixing the encodings read fine.
+– history.idx: one "<byte offset> <timestamp> <s|d>" line per run, so readers
+  can seek straight to the latest run or a time range without parsing the log.
+– Once the log holds keep_runs + compact_every runs it is compacted back to
+  (about) the newest keep_runs. With archive on, the runs cut off are moved
+  to compressed, append-only segments (history_archive/2026-08.jsonl.gz, one
+  per month by default) instead of being dropped; readers open a segment
+  only when the requested time range reaches back before the hot log.
+– An old {"runs": [...]} history.json is migrated on first use.
+– backend "sqlite" keeps unbounded history in history.db instead (history_db.py).
+Configured under "history" in config.json.
+`python run_history.py migrate|compact|archive|reencode|stats|changes` for maintenance.
+"""
+
+import os, json, bisect, argparse, importlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from catalog import Catalog, encode_run, decode_run, size_counts, record_size_counts
+from config_file import load_config, section
+
+DEFAULT_SETTINGS = {
+    "backend":        "jsonl",        # or "sqlite"
+    "file":           "history.jsonl",
+    "db_file":        "history.db",
+    "encoding":       "compact",      # or "delta" / "full"
+    "snapshot_every": 24,
+    "keep_runs":      720,            # ~45 days of hourly checks
+    "compact_every":  72,
+    "legacy_file":    "history.json",
+    "state_file":     "current_state.json",   # current_state.py
+    "archive":             True,      # keep compacted runs in compressed segments
+    "archive_dir":         "history_archive",
+    "archive_period":      "month",   # or "week" / "day"
+    "archive_compression": "gzip",    # or "lzma"
+}
+
+def settings(config):
+    return section(config, "history", DEFAULT_SETTINGS)
+
+def run_timestamp(run, default="-"):
+    return run[0]["timestamp"] if run else default
+
+# ─────────────────────────────────────────────────────────────
+# DELTA ENCODING
+# ─────────────────────────────────────────────────────────────
+# A delta line is {"t": <run timestamp>, "d": [one item per store result]}.
+# Each item is either {"full": <result>} for a store missing from the
+# previous run, or {"s": store, "dt": µs after "t", "set": {changed keys},
+# "rm": [removed keys], "pc": {index: {changed product fields}}} – or "p" with the
+# whole product list when the products themselves changed.
+OWN_KEYS = ("store", "timestamp", "products")
+PRODUCT_KEYS = {"name", "price", "available", "size", "price_cents"}
+
+def _micros(ts, t0):
+    return round((datetime.fromisoformat(ts) - t0) / timedelta(microseconds=1))
+
+def _products_match(new, old):
+    return [p["name"] for p in new] == [p["name"] for p in old] and \
+           all(p.keys() == q.keys() and p.keys() <= PRODUCT_KEYS for p, q in zip(new, old))
+
+def encode_delta(prev, run):
+    """What changed in `run` since `prev` (both full runs)."""
+    before = {e["store"]: e for e in prev}
+    t0     = datetime.fromisoformat(run[0]["timestamp"])
+    items  = []
+    for entry in run:
+        old = before.get(entry["store"])
+        if old is None or "products" not in entry:
+            items.append({"full": entry})
+            continue
+        item = {"s": entry["store"], "dt": _micros(entry["timestamp"], t0)}
+        if (t0 + timedelta(microseconds=item["dt"])).isoformat() != entry["timestamp"]:
+            item["ts"] = entry["timestamp"]   # not a plain isoformat() string
+        changed = {k: v for k, v in entry.items() if k not in OWN_KEYS and (k not in old or old[k] != v)}
+        removed = [k for k in old if k not in OWN_KEYS and k not in entry]
+        if changed: item["set"] = changed
+        if removed: item["rm"]  = removed
+        if _products_match(entry["products"], old.get("products", [])):
+            pc = {str(i): {k: v for k, v in p.items() if q[k] != v}
+                  for i, (p, q) in enumerate(zip(entry["products"], old["products"])) if p != q}
+            if pc: item["pc"] = pc
+        else:
+            item["p"] = entry["products"]
+        items.append(item)
+    return {"t": run[0]["timestamp"], "d": items}
+
+def apply_delta(prev, delta):
+    """Rebuild a full run from the previous run and a delta line."""
+    before = {e["store"]: e for e in prev}
+    t0     = datetime.fromisoformat(delta["t"])
+    run    = []
+    for item in delta["d"]:
+        if "full" in item:
+            run.append(item["full"])
+            continue
+        old   = before[item["s"]]
+        entry = {k: v for k, v in old.items() if k not in item.get("rm", ())}
+        entry["timestamp"] = item.get("ts") or (t0 + timedelta(microseconds=item["dt"])).isoformat()
+        entry.update(item.get("set", {}))
+        if "p" in item:
+            entry["products"] = item["p"]
+        else:
+            entry["products"] = [dict(p) for p in old["products"]]
+            for i, change in item.get("pc", {}).items():
+                if isinstance(change, list):   # [price, available], as first written
+                    change = {"price": change[0], "available": change[1]}
+                entry["products"][int(i)].update(change)
+        run.append(entry)
+    return run
+
+# ─────────────────────────────────────────────────────────────
+# ARCHIVE
+# ─────────────────────────────────────────────────────────────
+COMPRESSION = {"gzip": ("gzip", ".jsonl.gz"), "lzma": ("lzma", ".jsonl.xz")}
+
+def segment_key(stamp, period):
+    """'2026-08-14T09:00:00+08:00' → '2026-08' (month), '2026-W33' (week) or '2026-08-14' (day)."""
+    if period == "day":
+        return stamp[:10]
+    if period == "week":
+        year, week, _ = datetime.fromisoformat(stamp).isocalendar()
+        return f"{year}-W{week:02d}"
+    return stamp[:7]
+
+class Archive:
+    """Compressed segments of old runs, one per period, listed in index.json."""
+
+    def __init__(self, folder, catalog, period="month", compression="gzip"):
+        self.folder      = folder
+        self.index_path  = os.path.join(folder, "index.json")
+        self.catalog     = catalog
+        self.period      = period
+        self.compression = compression
+        try:
+            # key -> {"file", "first", "last", "runs"}
+            self.segments = json.load(open(self.index_path))
+        except FileNotFoundError:
+            self.segments = {}
+        self._loaded = {}   # key -> decoded runs
+
+    def _open(self, name, mode):
+        module = "lzma" if name.endswith(".xz") else "gzip"
+        return importlib.import_module(module).open(os.path.join(self.folder, name), mode)
+
+    def __len__(self):
+        return sum(seg["runs"] for seg in self.segments.values())
+
+    def first_stamp(self):
+        return min((seg["first"] for seg in self.segments.values()), default=None)
+
+    def add(self, runs):
+        """Append runs (oldest first, all older than anything archived later)."""
+        groups = {}
+        for run in runs:
+            if run:
+                groups.setdefault(segment_key(run_timestamp(run), self.period), []).append(run)
+        if not groups:
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        lines = {key: [json.dumps(encode_run(run, self.catalog), separators=(",", ":")) + "\n"
+                       for run in group] for key, group in groups.items()}
+        self.catalog.save()   # before the segments that refer to the new ids
+        for key, group in groups.items():
+            ext = COMPRESSION[self.compression][1]
+            seg = self.segments.setdefault(key, {"file": key + ext, "first": run_timestamp(group[0]),
+                                                 "last": None, "runs": 0})
+            # Each append adds a new gzip member / xz stream; both read back as one file
+            with self._open(seg["file"], "at") as f:
+                f.writelines(lines[key])
+            seg["last"]  = run_timestamp(group[-1])
+            seg["runs"] += len(group)
+            self._loaded.pop(key, None)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(dict(sorted(self.segments.items())), f, indent=1)
+        os.replace(tmp, self.index_path)
+
+    def _segment(self, key):
+        if key not in self._loaded:
+            with self._open(self.segments[key]["file"], "rt") as f:
+                self._loaded[key] = [decode_run(json.loads(line), self.catalog) for line in f]
+        return self._loaded[key]
+
+    def runs(self, since=None, until=None):
+        """Archived runs with since <= timestamp < until, oldest first; only
+        the segments overlapping the range are decompressed."""
+        out = []
+        for key, seg in sorted(self.segments.items()):
+            if (since and seg["last"] < since) or (until and seg["first"] >= until):
+                continue
+            out.extend(run for run in self._segment(key)
+                       if (not since or run_timestamp(run) >= since)
+                       and (not until or run_timestamp(run) < until))
+        return out
+
+    def reversed_runs(self):
+        for key in sorted(self.segments, reverse=True):
+            yield from reversed(self._segment(key))
+
+    def before(self, stamp):
+        """The newest archived run older than `stamp`, or None."""
+        for key, seg in sorted(self.segments.items(), reverse=True):
+            if seg["first"] >= stamp:
+                continue
+            for run in reversed(self._segment(key)):
+                if run_timestamp(run) < stamp:
+                    return run
+        return None
+
+    def recent(self, n):
+        """The newest n archived runs, oldest first."""
+        out = []
+        for run in self.reversed_runs():
+            if len(out) >= n:
+                break
+            out.append(run)
+        return out[::-1]
+
+# ─────────────────────────────────────────────────────────────
+# LOG
+# ─────────────────────────────────────────────────────────────
+class RunLog:
+    """history.jsonl plus its byte-offset index (and, optionally, the archive
+    of runs compacted out of it)."""
+
+    CACHE_RUNS = 128
+
+    def __init__(self, path=DEFAULT_SETTINGS["file"], keep_runs=None, compact_every=None,
+                 encoding=None, snapshot_every=None, archive=None):
+        self.path           = path
+        self.index_path     = os.path.splitext(path)[0] + ".idx"
+        self.keep_runs      = keep_runs or DEFAULT_SETTINGS["keep_runs"]
+        self.compact_every  = compact_every or DEFAULT_SETTINGS["compact_every"]
+        self.encoding       = encoding or DEFAULT_SETTINGS["encoding"]
+        self.snapshot_every = snapshot_every or DEFAULT_SETTINGS["snapshot_every"]
+        self.catalog        = Catalog(os.path.splitext(path)[0] + ".catalog.json")
+        # archive: {"dir", "period", "compression"}, or None to drop compacted runs
+        self.archive        = Archive(archive["dir"], self.catalog, archive["period"],
+                                      archive["compression"]) if archive else None
+        self._offsets       = None
+        self._stamps        = None
+        self._kinds         = None
+        self._cache         = OrderedDict()   # position -> rebuilt run
+
+    # ─── index ───────────────────────────────────────────────
+    def _load_index(self):
+        if self._offsets is not None:
+            return
+        offsets, stamps, kinds = [], [], []
+        try:
+            with open(self.index_path) as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) in (2, 3):   # 2 fields: written before delta encoding
+                        offsets.append(int(parts[0]))
+                        stamps.append(parts[1])
+                        kinds.append(parts[2] if len(parts) == 3 else "s")
+        except FileNotFoundError:
+            pass
+        self._offsets, self._stamps, self._kinds = offsets, stamps, kinds
+        self._repair()
+
+    def _repair(self):
+        """Bring the index in line with the log after a crash or a hand edit."""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        with open(self.path, "ab+") as log:
+            # Drop index entries that point past (or into the middle of) the log
+            while self._offsets:
+                log.seek(self._offsets[-1])
+                line = log.readline()
+                if line.endswith(b"\n"):
+                    break
+                self._offsets.pop(); self._stamps.pop(); self._kinds.pop()
+            pos = log.tell() if self._offsets else 0
+            if pos == size:
+                return
+            # Index the runs it is missing; a torn last line is cut off
+            log.seek(pos)
+            while True:
+                line = log.readline()
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                previous = self._stamps[-1] if self._stamps else "-"
+                if isinstance(record, dict) and "c" in record:
+                    self._index(pos, record["c"], "s")
+                elif isinstance(record, dict):
+                    self._index(pos, record["t"], "d")
+                else:
+                    self._index(pos, run_timestamp(record, previous), "s")
+                pos += len(line)
+            if pos < size:
+                log.truncate(pos)
+        self._write_index()
+
+    def _index(self, offset, stamp, kind):
+        self._offsets.append(offset); self._stamps.append(stamp); self._kinds.append(kind)
+
+    def _write_index(self):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.writelines(f"{o} {s} {k}\n" for o, s, k in zip(self._offsets, self._stamps, self._kinds))
+        os.replace(tmp, self.index_path)
+
+    # ─── writing ─────────────────────────────────────────────
+    def _since_snapshot(self):
+        for back, kind in enumerate(reversed(self._kinds)):
+            if kind == "s":
+                return back
+        return None
+
+    def _encode(self, run):
+        """(line, kind) for the next run."""
+        if self.encoding == "compact" and run:
+            record = encode_run(run, self.catalog)
+            self.catalog.save()   # before the line that refers to the new ids
+            return json.dumps(record, separators=(",", ":")), "s"
+        since = self._since_snapshot()
+        if (self.encoding != "delta" or not run or since is None
+                or since + 1 >= self.snapshot_every):
+            return json.dumps(run, separators=(",", ":")), "s"
+        prev = self.latest() or []
+        return json.dumps(encode_delta(prev, run), separators=(",", ":")), "d"
+
+    def append(self, run):
+        self._load_index()
+        line, kind = self._encode(run)
+        stamp = run_timestamp(run, self._stamps[-1] if self._stamps else "-")   # keep the index sorted
+        with open(self.path, "ab") as log:
+            offset = log.tell()
+            log.write((line + "\n").encode())
+        with open(self.index_path, "a") as f:
+            f.write(f"{offset} {stamp} {kind}\n")
+        self._index(offset, stamp, kind)
+        self._remember(len(self._offsets) - 1, run)
+        if len(self._offsets) >= self.keep_runs + self.compact_every:
+            self.compact()
+
+    def compact(self, keep_runs=None):
+        """Move old runs to the archive (or drop them) so about keep_runs
+        remain (the log must start at a snapshot)."""
+        self._load_index()
+        keep    = keep_runs or self.keep_runs
+        dropped = len(self._offsets) - keep
+        while dropped > 0 and self._kinds[dropped] != "s":
+            dropped -= 1
+        if dropped <= 0:
+            return 0
+        if self.archive is not None:
+            # Archive first: a crash in between leaves the runs in both places, never in neither
+            self.archive.add(self._read(range(dropped)))
+        start = self._offsets[dropped]
+        tmp   = self.path + ".tmp"
+        with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+            src.seek(start)
+            while chunk := src.read(1 << 20):
+                dst.write(chunk)
+        self._offsets = [o - start for o in self._offsets[dropped:]]
+        self._stamps  = self._stamps[dropped:]
+        self._kinds   = self._kinds[dropped:]
+        self._cache.clear()
+        os.replace(tmp, self.path)
+        self._write_index()
+        verb = "archived" if self.archive is not None else "dropped"
+        print(f"🗜️ Compacted {os.path.basename(self.path)}: {verb} {dropped} old runs")
+        return dropped
+
+    def reencode(self):
+        """Rewrite the hot log with the current encoding (e.g. full → delta)."""
+        self._load_index()
+        runs = self._read(range(len(self._offsets)))
+        for path in (self.path, self.index_path):
+            if os.path.exists(path):
+                os.replace(path, path + ".bak")
+        self._offsets = self._stamps = self._kinds = None
+        self._cache.clear()
+        archive, self.archive = self.archive, None   # don't archive runs that are already hot
+        for run in runs:
+            self.append(run)
+        self.archive = archive
+        for path in (self.path, self.index_path):
+            if os.path.exists(path + ".bak"):
+                os.remove(path + ".bak")
+        return len(runs)
+
+    def migrate(self, legacy_path):
+        """Import a {"runs": [...]} file once; it is renamed to *.migrated."""
+        if not os.path.exists(legacy_path) or (os.path.exists(self.path) and os.path.getsize(self.path)):
+            return 0
+        runs = json.load(open(legacy_path)).get("runs", [])
+        for run in runs:
+            self.append(run)
+        os.replace(legacy_path, legacy_path + ".migrated")
+        print(f"📦 Migrated {len(runs)} runs from {legacy_path} to {self.path}")
+        return len(runs)
+
+    # ─── reading ─────────────────────────────────────────────
+    def __len__(self):
+        self._load_index()
+        return len(self._offsets) + (len(self.archive) if self.archive is not None else 0)
+
+    def _needs_archive(self, since):
+        """Whether a range starting at `since` reaches back before the hot log."""
+        if self.archive is None or not self.archive.segments:
+            return False
+        return not since or not self._stamps or since < self._stamps[0]
+
+    def _remember(self, i, run):
+        self._cache[i] = run
+        self._cache.move_to_end(i)
+        while len(self._cache) > self.CACHE_RUNS:
+            self._cache.popitem(last=False)
+
+    def _run_at(self, log, i):
+        """Rebuild run i from the nearest cached run or snapshot before it."""
+        if i in self._cache:
+            self._cache.move_to_end(i)
+            return self._cache[i]
+        start = i
+        while start not in self._cache and self._kinds[start] != "s":
+            start -= 1
+        run = self._cache.get(start)
+        for k in range(start, i + 1):
+            if k == start and run is not None:
+                continue
+            log.seek(self._offsets[k])
+            record = json.loads(log.readline())
+            if isinstance(record, list):
+                run = record
+            elif "c" in record:
+                run = decode_run(record, self.catalog)
+            else:
+                run = apply_delta(run, record)
+            self._remember(k, run)
+        return run
+
+    def _read(self, positions):
+        positions = list(positions)
+        if not positions:
+            return []
+        with open(self.path, "rb") as log:
+            # Oldest first, so each delta builds on the run just rebuilt
+            rebuilt = {i: self._run_at(log, i) for i in sorted(set(positions))}
+        return [rebuilt[i] for i in positions]
+
+    def latest(self):
+        """The newest run, or None."""
+        runs = self.recent(1)
+        return runs[0] if runs else None
+
+    def recent(self, n):
+        """The newest n runs, oldest first."""
+        self._load_index()
+        hot = self._read(range(max(0, len(self._offsets) - n), len(self._offsets)))
+        if len(hot) < n and self._needs_archive(None):
+            return self.archive.recent(n - len(hot)) + hot
+        return hot
+
+    def runs(self, since=None, until=None):
+        """Runs with since <= timestamp < until (ISO strings, AWST), oldest first."""
+        self._load_index()
+        lo = bisect.bisect_left(self._stamps, since) if since else 0
+        hi = bisect.bisect_left(self._stamps, until) if until else len(self._stamps)
+        cold = self.archive.runs(since, until) if self._needs_archive(since) else []
+        return cold + self._read(range(lo, hi))
+
+    def reversed_runs(self):
+        """Newest first, rebuilt one snapshot block at a time so callers can stop early."""
+        self._load_index()
+        end = len(self._offsets)
+        while end > 0:
+            start = end - 1
+            while start > 0 and self._kinds[start] != "s":
+                start -= 1
+            yield from reversed(self._read(range(start, end)))
+            end = start
+        if self.archive is not None:
+            yield from self.archive.reversed_runs()
+
+    def size_counts(self, since=None, until=None, last=None):
+        """Per-run, per-store available/total counts by size (the dashboard chart).
+        Compact lines are counted from their bits without building run dicts."""
+        self._load_index()
+        lo  = bisect.bisect_left(self._stamps, since) if since else 0
+        hi  = bisect.bisect_left(self._stamps, until) if until else len(self._stamps)
+        if last:
+            lo = max(lo, hi - last)
+        out = []
+        if self._needs_archive(since) and (not last or hi - lo < last):
+            cold = self.archive.runs(since, until)
+            if last:
+                cold = cold[max(0, len(cold) - (last - (hi - lo))):]
+            out = [size_counts(run) for run in cold]
+        with open(self.path, "rb") as log:
+            for i in range(lo, hi):
+                if i not in self._cache and self._kinds[i] == "s":
+                    log.seek(self._offsets[i])
+                    record = json.loads(log.readline())
+                    if isinstance(record, dict) and "c" in record:
+                        out.append(record_size_counts(record, self.catalog))
+                        continue
+                out.append(size_counts(self._run_at(log, i)))
+        return out
+
+    def changes(self, since=None, until=None):
+        """[(timestamp, store, product, change, price)] between consecutive successful checks."""
+        self._load_index()
+        lo   = bisect.bisect_left(self._stamps, since) if since else 0
+        hi   = bisect.bisect_left(self._stamps, until) if until else len(self._stamps)
+        runs = self._read(range(lo, hi))
+        if self._needs_archive(since):
+            runs = self.archive.runs(since, until) + runs
+        if since:
+            # The newest run before `since` (hot or archived) is the first one's baseline
+            if lo > 0:
+                base = self._read([lo - 1])[0]
+            else:
+                base = self.archive.before(since) if self.archive is not None else None
+            if base:
+                runs = [base] + runs
+        return diff_runs(runs, since)
+
+def diff_runs(runs, since=None):
+    """[(timestamp, store, product, change, price)] between consecutive successful
+    checks of each store in `runs` (oldest first); runs before `since` only set the baseline."""
+    last, out = {}, []
+    for run in runs:
+        for entry in run:
+            if entry.get("status", "ok") != "ok":
+                continue
+            now = {p["name"]: p for p in entry["products"]}
+            before = last.get(entry["store"])
+            last[entry["store"]] = now
+            if before is None or (since and entry["timestamp"] < since):
+                continue
+            for name, p in now.items():
+                q = before.get(name)
+                if q is None:
+                    out.append((entry["timestamp"], entry["store"], name, "new", p["price"]))
+                elif q["available"] != p["available"]:
+                    change = "now_available" if p["available"] else "now_unavailable"
+                    out.append((entry["timestamp"], entry["store"], name, change, p["price"]))
+                elif q["price"] != p["price"]:
+                    out.append((entry["timestamp"], entry["store"], name, "price", p["price"]))
+    return out
+
+def open_history(config=None):
+    """The configured run history, migrating older formats into it if needed."""
+    config = load_config(config)
+    opts = settings(config)
+    archive = None
+    if opts["archive"]:
+        archive = {"dir": opts["archive_dir"], "period": opts["archive_period"],
+                   "compression": opts["archive_compression"]}
+    log  = RunLog(opts["file"], opts["keep_runs"], opts["compact_every"],
+                  opts["encoding"], opts["snapshot_every"], archive)
+    if opts["backend"] != "sqlite":
+        log.migrate(opts["legacy_file"])
+        return log
+    from history_db import SqliteHistory
+    db = SqliteHistory(opts["db_file"])
+    if not len(db):
+        if os.path.exists(opts["legacy_file"]) and not os.path.exists(log.path):
+            runs = json.load(open(opts["legacy_file"])).get("runs", [])
+        else:
+            runs = log.runs() if os.path.exists(log.path) else []
+        if runs:
+            print(f"📦 Imported {db.import_runs(runs)} runs into {opts['db_file']}")
+    return db
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the run history log")
+    parser.add_argument("cmd", choices=["migrate", "compact", "archive", "reencode", "stats", "changes"])
+    parser.add_argument("--since", default=None, help="for changes: ISO date, e.g. 2026-09-01")
+    parser.add_argument("--keep", type=int, default=None, help="for archive: runs to keep hot")
+    args = parser.parse_args(argv)
+    history = open_history()   # migrates as a side effect
+    if not isinstance(history, RunLog) and args.cmd != "changes":
+        parser.error("these commands work on the JSONL log (history.backend = \"jsonl\")")
+    if args.cmd == "compact":
+        history.compact()
+    if args.cmd == "archive":
+        if history.archive is None:
+            parser.error("the archive is off (history.archive = false)")
+        history.compact(args.keep)
+    if args.cmd == "reencode":
+        before = os.path.getsize(history.path)
+        count  = history.reencode()
+        print(f"Re-encoded {count} runs as {history.encoding}: "
+              f"{before/1024:.1f} KB → {os.path.getsize(history.path)/1024:.1f} KB")
+    if args.cmd == "stats":
+        history._load_index()
+        size = os.path.getsize(history.path) if os.path.exists(history.path) else 0
+        print(f"{len(history._offsets)} hot runs ({history._kinds.count('s')} snapshots), {size/1024:.1f} KB in {history.path}")
+        if history._stamps:
+            print(f"from {history._stamps[0]} to {history._stamps[-1]}")
+        if history.archive is not None and history.archive.segments:
+            for key, seg in sorted(history.archive.segments.items()):
+                path = os.path.join(history.archive.folder, seg["file"])
+                print(f"  archive {key}: {seg['runs']} runs, {os.path.getsize(path)/1024:.1f} KB")
+    if args.cmd == "changes":
+        for ts, store, product, change, price in history.changes(since=args.since):
+            print(f"{ts[:16]}  {store:<14} {change:<16} {product} ({price})")
+
+if __name__ == "__main__":
+    main()
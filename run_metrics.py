@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Per-step latency metrics for checker runs.
+– RunMetrics.span(step, store) times one phase (launch, goto_store, search…).
+– Each run is appended as one JSON line to metrics.jsonl, next to the
+  history log. Only the last metrics.keep_runs runs are kept, since the
+  workflow commits the file every hour.
+– `python run_metrics.py report` prints p50/p95 per step across recent runs.
+"""
+
+import os, json, time, math, argparse
+from contextlib import contextmanager
+
+from config_file import section
+
+METRICS_FILE = "metrics.jsonl"   # lives next to history.jsonl
+
+DEFAULT_SETTINGS = {
+    "keep_runs": 1000,   # about six weeks of hourly runs
+}
+
+# Canonical step order for reports; anything else is listed after these.
+STEPS = [
+    "launch", "goto_store", "set_location", "home", "search", "goto_search",
+    "tile_wait", "extraction", "screenshot", "close", "store_total",
+    "browser_close", "notify", "history", "deliver",
+]
+
+def settings(config):
+    return section(config, "metrics", DEFAULT_SETTINGS)
+
+class RunMetrics:
+    """Collects step durations for one run, per store and run-wide."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.t0         = time.monotonic()
+        self.run        = {}   # step -> seconds (not tied to a store)
+        self.stores     = {}   # store -> step -> seconds
+        self.current    = {}   # store -> last step entered (for error reports)
+
+    def add(self, step, seconds, store=None):
+        bucket = self.stores.setdefault(store, {}) if store else self.run
+        bucket[step] = round(bucket.get(step, 0.0) + seconds, 4)
+
+    def merge(self, run_steps, store_steps):
+        """Fold in timings collected elsewhere (e.g. a worker process)."""
+        for step, s in run_steps.items():
+            self.add(step, s)
+        for store, steps in store_steps.items():
+            for step, s in steps.items():
+                self.add(step, s, store)
+
+    @contextmanager
+    def span(self, step, store=None):
+        if store:
+            self.current[store] = step
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(step, time.monotonic() - t0, store)
+
+    def to_record(self):
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started_at)),
+            "total_s":    round(time.monotonic() - self.t0, 4),
+            "run":        self.run,
+            "stores":     self.stores,
+        }
+
+    def write(self, path=METRICS_FILE, config=None):
+        """Append this run as one JSON line, then drop runs beyond keep_runs."""
+        with open(path, "a") as f:
+            f.write(json.dumps(self.to_record()) + "\n")
+        trim(path, settings(config)["keep_runs"])
+        print(f"⏱️ Metrics written to {os.path.basename(path)}")
+
+def trim(path, keep_runs):
+    """Keep only the last `keep_runs` lines of the metrics file (atomically)."""
+    with open(path) as f:
+        lines = f.readlines()
+    if len(lines) <= keep_runs:
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.writelines(lines[-keep_runs:])
+    os.replace(tmp, path)
+
+# ─────────────────────────────────────────────────────────────
+# REPORT
+# ─────────────────────────────────────────────────────────────
+def load_records(path=METRICS_FILE, last=None):
+    records = []
+    try:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    pass  # half-written line from an interrupted run
+    except FileNotFoundError:
+        pass
+    return records[-last:] if last else records
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    k = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[k]
+
+def step_samples(records, store=None):
+    """step -> list of seconds, from run-wide and per-store timings."""
+    samples = {}
+    for rec in records:
+        samples.setdefault("run_total", []).append(rec["total_s"])
+        if store is None:
+            for step, s in rec.get("run", {}).items():
+                samples.setdefault(step, []).append(s)
+        for name, steps in rec.get("stores", {}).items():
+            if store and name.lower() != store.lower():
+                continue
+            for step, s in steps.items():
+                samples.setdefault(step, []).append(s)
+    return samples
+
+def report(records, store=None):
+    samples = step_samples(records, store)
+    if not records:
+        print("No metrics recorded yet.")
+        return
+    order = [s for s in STEPS + ["run_total"] if s in samples]
+    order += sorted(s for s in samples if s not in order)
+    scope = f" for {store}" if store else ""
+    print(f"Step latency over {len(records)} runs{scope} (seconds)")
+    print(f"{'step':<14}{'n':>6}{'p50':>10}{'p95':>10}{'max':>10}")
+    for step in order:
+        vals = samples[step]
+        print(f"{step:<14}{len(vals):>6}{percentile(vals, 50):>10.2f}"
+              f"{percentile(vals, 95):>10.2f}{max(vals):>10.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Checker step latency metrics")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rep = sub.add_parser("report", help="p50/p95 per step across runs")
+    rep.add_argument("--last", type=int, default=None, help="only the last N runs")
+    rep.add_argument("--store", default=None, help="only this store's steps")
+    rep.add_argument("--file", default=METRICS_FILE)
+    args = parser.parse_args(argv)
+    if args.cmd == "report":
+        report(load_records(args.file, args.last), args.store)
+
+if __name__ == "__main__":
+    main()
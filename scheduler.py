@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Adaptive check scheduling.
+– Learns, per store and hour of day, how often a check found a restock or
+  sell-out (from consecutive successful checks in the last learn_days of history).
+– Splits a global budget of store-checks per day across (store, hour) cells
+  in proportion to those change rates, so volatile stores and hours get
+  short intervals and quiet ones long intervals.
+– Each invocation checks only the stores that are due; the rest are carried
+  forward in the run record with their last known products.
+– `python scheduler.py` prints the current plan.
+Configured under "scheduling" in config.json.
+"""
+
+import json, math, argparse
+from datetime import datetime, timedelta
+
+from config_file import section
+
+DEFAULT_SETTINGS = {
+    "enabled":              False,
+    "daily_budget":         None,    # store-checks per day; None = one per store per operating hour
+    "min_interval_minutes": 30,
+    "max_interval_minutes": 360,
+    "prior_weight":         3,       # pseudo-observations pulling sparse cells to the overall rate
+    "learn_days":           28,
+}
+
+def settings(config):
+    return section(config, "scheduling", DEFAULT_SETTINGS)
+
+def operating_hours(config):
+    hours = config["operating_hours"]
+    return list(range(hours["start"], hours["end"]))
+
+def _status(entry):
+    return entry.get("status", "ok")
+
+def _availability(entry):
+    return {p["name"]: p["available"] for p in entry.get("products", [])}
+
+# ─────────────────────────────────────────────────────────────
+# LEARNING
+# ─────────────────────────────────────────────────────────────
+def learn_rates(runs):
+    """(store, hour) -> [observations, changes] from consecutive ok checks."""
+    cells, last = {}, {}
+    for run in runs:
+        for entry in run:
+            if _status(entry) != "ok":
+                continue
+            store = entry["store"]
+            now   = _availability(entry)
+            if store in last:
+                hour = datetime.fromisoformat(entry["timestamp"]).hour
+                cell = cells.setdefault((store, hour), [0, 0])
+                cell[0] += 1
+                cell[1] += int(now != last[store])
+            last[store] = now
+    return cells
+
+def last_checked(runs):
+    """store -> datetime of its last real check (ok or error, not skipped)."""
+    seen = {}
+    for run in runs:
+        for entry in run:
+            if _status(entry) != "unknown":
+                seen[entry["store"]] = datetime.fromisoformat(entry["timestamp"])
+    return seen
+
+def checks_on(runs, day):
+    """Store-checks spent on a given date (ok or error)."""
+    return sum(1 for run in runs for entry in run
+               if _status(entry) != "unknown" and entry["timestamp"].startswith(day))
+
+# ─────────────────────────────────────────────────────────────
+# PLANNING
+# ─────────────────────────────────────────────────────────────
+def plan(stores, runs, config):
+    """store -> hour -> target minutes between checks."""
+    opts   = settings(config)
+    hours  = operating_hours(config)
+    names  = [s["name"] for s in stores]
+    budget = opts["daily_budget"] or len(names) * len(hours)
+    cells  = learn_rates(runs)
+
+    obs     = sum(c[0] for c in cells.values())
+    overall = sum(c[1] for c in cells.values()) / obs if obs else 0.0
+    prior   = opts["prior_weight"]
+    rates   = {}
+    for name in names:
+        for hour in hours:
+            n, changes = cells.get((name, hour), (0, 0))
+            rates[(name, hour)] = (changes + prior * overall) / (n + prior) if n + prior else 0.0
+    # Nothing learned yet (or nothing ever changed): spread evenly
+    floor = max(overall, 1e-6) * 0.1
+    total = sum(max(r, floor) for r in rates.values())
+
+    schedule = {}
+    for (name, hour), rate in rates.items():
+        checks   = budget * max(rate, floor) / total   # checks in this store-hour
+        interval = 60 / checks if checks else opts["max_interval_minutes"]
+        interval = min(max(interval, opts["min_interval_minutes"]), opts["max_interval_minutes"])
+        schedule.setdefault(name, {})[hour] = round(interval)
+    return schedule
+
+def due_stores(stores, runs, config, now):
+    """Split stores into (due, not_due) for a run at `now`, within today's budget."""
+    opts     = settings(config)
+    schedule = plan(stores, runs, config)
+    seen     = last_checked(runs)
+    hour     = now.hour
+    overdue  = []
+    for store in stores:
+        interval = schedule[store["name"]].get(hour, opts["max_interval_minutes"])
+        last     = seen.get(store["name"])
+        ratio    = math.inf if last is None else (now - last).total_seconds() / 60 / interval
+        overdue.append((ratio, store))
+
+    budget    = opts["daily_budget"] or len(stores) * len(operating_hours(config))
+    remaining = max(0, budget - checks_on(runs, now.date().isoformat()))
+    # A little slack so a store isn't pushed to the next tick by a few minutes
+    ready = sorted((r for r in overdue if r[0] >= 0.9), key=lambda r: -r[0])
+    if len(ready) > remaining:
+        print(f"💰 Daily budget of {budget} checks nearly spent; checking the {remaining} most overdue")
+        ready = ready[:remaining]
+    due = [s for _, s in ready]
+    return due, [s for s in stores if s not in due]
+
+def tick_minutes(config):
+    """How often a long-running checker should wake up to look for due stores."""
+    opts = settings(config)
+    if opts["enabled"]:
+        return opts["min_interval_minutes"]
+    return config.get("check_interval_minutes", 60)
+
+def carry_forward(result, runs):
+    """Fill a not-due store's result with its last known products."""
+    for run in reversed(runs):
+        for entry in run:
+            if entry["store"] == result["store"] and _status(entry) == "ok":
+                result["available"]    = entry["available"]
+                result["products"]     = entry["products"]
+                result["last_checked"] = entry["timestamp"]
+                return result
+    return result
+
+# ─────────────────────────────────────────────────────────────
+# CLI
+# ─────────────────────────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the adaptive check schedule")
+    parser.add_argument("--config", default="config.json")
+    args = parser.parse_args(argv)
+
+    from run_history import open_history
+    from bamba_checker import get_awst_time
+    config = json.load(open(args.config))
+    since  = (get_awst_time() - timedelta(days=settings(config)["learn_days"])).isoformat()
+    runs   = open_history(config).runs(since=since)
+    schedule = plan(config["stores"], runs, config)
+    cells    = learn_rates(runs)
+    hours    = operating_hours(config)
+    opts     = settings(config)
+    print(f"Budget: {opts['daily_budget'] or len(config['stores']) * len(hours)} checks/day "
+          f"(scheduling {'on' if opts['enabled'] else 'off'})")
+    print("Target minutes between checks (observations/changes learned):")
+    print(f"{'hour':<6}" + "".join(f"{s['name']:>18}" for s in config["stores"]))
+    for hour in hours:
+        row = f"{hour:02d}:00 "
+        for s in config["stores"]:
+            n, c = cells.get((s["name"], hour), (0, 0))
+            row += f"{schedule[s['name']][hour]:>10} ({n:>2}/{c:>2})"
+        print(row)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Screenshot policy for the scrapers.
+– mode: "off", "on_error" (only the error shot) or "full" (every step).
+– format: "jpeg" / "png" straight from Playwright, or "webp" when Pillow is
+  installed (converted on the writer thread; falls back to jpeg otherwise).
+– full_page: whole page vs. just the viewport.
+– Files are written by a background thread so the scrape never waits on disk,
+  and the folder is pruned to max_files / max_mb (oldest first).
+Configured under "screenshots" in config.json.
+"""
+
+import os, io, threading, importlib.util
+from datetime import datetime
+import pytz
+
+from run_metrics import RunMetrics
+
+# Pillow is optional and only needed for webp; imported on the writer thread
+HAS_PIL = importlib.util.find_spec("PIL") is not None
+
+MODES = ("off", "on_error", "full")
+DEFAULT_POLICY = {
+    "mode":      "on_error",
+    "format":    "jpeg",
+    "quality":   60,
+    "full_page": False,
+    "folder":    "coles_screenshots",
+    "max_files": 200,
+    "max_mb":    50,
+}
+
+class ScreenshotPolicy:
+    """Decides which screenshots to take and writes them off the scrape path."""
+
+    def __init__(self, config=None):
+        policy = {**DEFAULT_POLICY, **((config or {}).get("screenshots") or {})}
+        if policy["mode"] not in MODES:
+            print(f"⚠️ Unknown screenshot mode {policy['mode']!r}; using on_error")
+            policy["mode"] = "on_error"
+        if policy["format"] == "webp" and not HAS_PIL:
+            print("⚠️ WebP screenshots need Pillow; saving jpeg instead")
+            policy["format"] = "jpeg"
+        self.policy  = policy
+        self.folder  = policy["folder"]
+        self._writer = None
+        self._lock   = threading.Lock()
+
+    def wants(self, step):
+        mode = self.policy["mode"]
+        return mode == "full" or (mode == "on_error" and step == "error")
+
+    def _capture_options(self):
+        fmt = self.policy["format"]
+        opts = {"full_page": self.policy["full_page"], "type": "png" if fmt in ("png", "webp") else "jpeg"}
+        if opts["type"] == "jpeg":
+            opts["quality"] = self.policy["quality"]
+        return opts
+
+    def _path(self, store, step):
+        ts  = datetime.now(pytz.timezone('Australia/Perth')).strftime("%Y%m%d_%H%M%S")
+        ext = "jpg" if self.policy["format"] == "jpeg" else self.policy["format"]
+        return os.path.join(self.folder, f"{store}_{step}_{ts}.{ext}")
+
+    # ─── capture ─────────────────────────────────────────────
+    def capture(self, page, store, step, metrics=None):
+        """Grab the screenshot (sync page) and queue it for writing."""
+        if not self.wants(step):
+            return None
+        with (metrics or RunMetrics()).span("screenshot", store):
+            data = page.screenshot(**self._capture_options())
+        return self._queue(data, store, step)
+
+    async def acapture(self, page, store, step, metrics=None):
+        """Async-page twin of capture()."""
+        if not self.wants(step):
+            return None
+        with (metrics or RunMetrics()).span("screenshot", store):
+            data = await page.screenshot(**self._capture_options())
+        return self._queue(data, store, step)
+
+    # ─── background writer ───────────────────────────────────
+    def _queue(self, data, store, step):
+        path = self._path(store, step)
+        with self._lock:
+            if self._writer is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screenshots")
+            self._writer.submit(self._write, path, data)
+        print("  📸", path)
+        return path
+
+    def _write(self, path, data):
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            if self.policy["format"] == "webp":
+                from PIL import Image
+                buf = io.BytesIO()
+                Image.open(io.BytesIO(data)).save(buf, "WEBP", quality=self.policy["quality"])
+                data = buf.getvalue()
+            with open(path, "wb") as f:
+                f.write(data)
+            self.prune()
+        except Exception as e:
+            print(f"  ⚠️ Could not save screenshot {path}: {e}")
+
+    def prune(self):
+        """Delete the oldest screenshots beyond max_files / max_mb."""
+        try:
+            entries = [e for e in os.scandir(self.folder) if e.is_file()]
+        except FileNotFoundError:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        total     = sum(e.stat().st_size for e in entries)
+        max_files = self.policy["max_files"]
+        max_bytes = self.policy["max_mb"] * 1024 * 1024
+        while entries and ((max_files and len(entries) > max_files) or (max_bytes and total > max_bytes)):
+            oldest = entries.pop(0)
+            total -= oldest.stat().st_size
+            try: os.remove(oldest.path)
+            except FileNotFoundError: pass
+
+    def close(self):
+        """Wait for queued writes to finish."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer:
+            writer.shutdown(wait=True)
@@ -0,0 +1,100 @@
+"""
+Per-store browser session state (cookies + localStorage).
+– Saved after a store's "Set location" flow succeeds.
+– Reused on later runs so a check can go straight to the search results.
+– Considered stale when missing, older than max_age_hours, saved for a
+  different store URL, not set to the store's config "id" (Coles keeps the
+  fulfilment store in cookies / localStorage, e.g. fulfillmentStoreId), or
+  when the checker reports it no longer works.
+"""
+
+import os, re, json, time
+from urllib.parse import unquote
+
+from config_file import section
+
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "dir": "session_state",
+    "max_age_hours": 24,
+}
+
+# Cookie / localStorage names, and JSON keys inside their values, that hold the store id
+STORE_KEY_RE   = re.compile(r"store_?id", re.I)
+STORE_VALUE_RE = re.compile(r'store_?id\\?"?\s*[:=]\s*\\?"?(\d+)', re.I)   # also inside JSON-in-JSON
+
+class StaleSession(Exception):
+    """A reused session is no longer set to the store being checked."""
+
+def _settings(config):
+    return section(config, "session_state", DEFAULT_SETTINGS)
+
+def state_path(store, config=None):
+    """File holding the saved state for one store."""
+    key = store.get("id") or store["name"].lower().replace(" ", "-")
+    return os.path.join(_settings(config)["dir"], f"{key}.json")
+
+def load(store, config=None):
+    """Return a Playwright storage_state dict for `store`, or None if unusable."""
+    settings = _settings(config)
+    if not settings["enabled"]:
+        return None
+    path = state_path(store, config)
+    try:
+        saved = json.load(open(path))
+    except (FileNotFoundError, ValueError):
+        return None
+    age_hours = (time.time() - saved.get("saved_at", 0)) / 3600
+    if age_hours > settings["max_age_hours"]:
+        print(f"  ⌛ Saved session for {store['name']} is {age_hours:.0f}h old; refreshing")
+        return None
+    if saved.get("store_url") != store["url"]:
+        return None
+    if not has_store(store, saved.get("storage_state") or {}):
+        print(f"  📍 Saved session for {store['name']} isn't set to store {store['id']}; refreshing")
+        return None
+    return saved.get("storage_state")
+
+def store_ids(storage_state):
+    """Store ids a storage_state's cookies and localStorage point at."""
+    items  = [(c["name"], c["value"]) for c in storage_state.get("cookies", [])]
+    items += [(e["name"], e["value"]) for origin in storage_state.get("origins", [])
+              for e in origin.get("localStorage", [])]
+    ids = set()
+    for name, value in items:
+        value = unquote(value)
+        if STORE_KEY_RE.search(name):
+            ids.update(re.findall(r"\d+", value))
+        ids.update(STORE_VALUE_RE.findall(value))
+    return {i.lstrip("0") for i in ids}
+
+def has_store(store, storage_state):
+    """True if the session is set to `store`. Stores without an "id" aren't checked."""
+    if not store.get("id"):
+        return True
+    return store["id"].lstrip("0") in store_ids(storage_state)
+
+def save(store, storage_state, config=None):
+    """Atomically persist `storage_state` (from context.storage_state())."""
+    settings = _settings(config)
+    if not settings["enabled"]:
+        return
+    if not has_store(store, storage_state):
+        print(f"  ⚠️ Session for {store['name']} doesn't name store {store['id']}; it won't be reused")
+    path = state_path(store, config)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({
+            "store_url":     store["url"],
+            "saved_at":      time.time(),
+            "storage_state": storage_state,
+        }, f)
+    os.replace(tmp, path)
+
+def discard(store, config=None):
+    """Forget a store's saved state (e.g. after it stopped working)."""
+    try:
+        os.remove(state_path(store, config))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,92 @@
+"""
+Splitting the store list across processes or separate invocations.
+– `--workers N`: one run fans its stores out to N local processes, each with
+  its own browser, and merges the results in place.
+– `--shard i/n`: this invocation checks only shard i (1-based) of n and saves
+  its results to shard_results/; a final `--merge-shards n` invocation loads
+  every shard, then notifies and appends history once. Stores of a missing
+  shard are recorded as unknown; with no shard results at all it does nothing.
+Stores are dealt round-robin so each shard gets a similar share.
+"""
+
+import os, json, glob
+
+SHARD_DIR = "shard_results"
+
+def parse_shard(spec):
+    """'2/4' → (2, 4); shards are numbered from 1."""
+    try:
+        index, count = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"--shard expects i/n, got {spec!r}")
+    if not 1 <= index <= count:
+        raise ValueError(f"--shard {spec}: i must be between 1 and n")
+    return index, count
+
+def shard_stores(stores, index, count):
+    """The stores that belong to shard `index` of `count`."""
+    return stores[index - 1::count]
+
+def order_results(stores, results):
+    """Put per-store results back in config order (unknown stores last)."""
+    position = {s["name"]: i for i, s in enumerate(stores)}
+    return sorted(results, key=lambda r: position.get(r["store"], len(position)))
+
+# ─────────────────────────────────────────────────────────────
+# 1) LOCAL WORKER PROCESSES
+# ─────────────────────────────────────────────────────────────
+def _check_chunk(args):
+    """Worker entry point: check a chunk of stores on the worker's own browser."""
+    stores, config = args
+    from bamba_checker import check_stores
+    from run_metrics import RunMetrics
+    metrics = RunMetrics()
+    results = check_stores(stores, config, metrics)
+    return results, metrics.run, metrics.stores
+
+def check_stores_parallel(stores, config, workers, metrics):
+    """Check `stores` across up to `workers` processes; results in config order."""
+    workers = max(1, min(workers, len(stores)))
+    chunks  = [(shard_stores(stores, i, workers), config) for i in range(1, workers + 1)]
+    print(f"🧩 Checking {len(stores)} stores across {workers} worker processes")
+    import multiprocessing
+    results = []
+    # spawn: each worker starts a clean interpreter for its own Playwright driver
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        for chunk_results, run_steps, store_steps in pool.imap_unordered(_check_chunk, chunks):
+            results.extend(chunk_results)
+            metrics.merge(run_steps, store_steps)
+    return order_results(stores, results)
+
+# ─────────────────────────────────────────────────────────────
+# 2) SEPARATE INVOCATIONS
+# ─────────────────────────────────────────────────────────────
+def shard_path(index, count):
+    return os.path.join(SHARD_DIR, f"shard-{index}-of-{count}.json")
+
+def write_shard_results(results, index, count):
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    path = shard_path(index, count)
+    tmp  = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp, path)
+    print(f"🧩 Saved shard {index}/{count} ({len(results)} stores) to {path}")
+    return path
+
+def merge_shard_results(stores, count):
+    """Load every shard file for an n-way split; returns (results, missing shards)."""
+    results, missing = [], []
+    for index in range(1, count + 1):
+        path = shard_path(index, count)
+        try:
+            results.extend(json.load(open(path)))
+        except (FileNotFoundError, ValueError):
+            missing.append(index)
+    if missing:
+        print(f"⚠️ Missing shard results for {missing}; their stores are recorded as unknown")
+    return order_results(stores, results), missing
+
+def clear_shard_results(count):
+    for path in glob.glob(os.path.join(SHARD_DIR, f"shard-*-of-{count}.json")):
+        os.remove(path)
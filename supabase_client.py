@@ -3,6 +3,7 @@ from supabase import create_client, Client
 import pytz
 from datetime import datetime
 import random
+import unsubscribe
 
 # Collection of Bamba facts for the enhanced subscription
 BAMBA_FACTS = [
@@ -98,56 +99,12 @@ def get_subscribers(mode=None):
     return result.data
 
 def generate_unsubscribe_token(email):
-    """Generate a secure token for unsubscribing."""
-    # Create a timestamp to expire tokens after some time
-    timestamp = int(datetime.now().timestamp())
-    # Combine with email and a secret to make it secure
-    message = f"{email}|{timestamp}"
-    # Use the same Fernet key you use for encryption
-    from cryptography.fernet import Fernet
-    fernet_key = os.getenv("FERNET_KEY")
-    f = Fernet(fernet_key.encode())
-    # Encrypt and return as a URL-safe string
-    return f.encrypt(message.encode()).decode().replace('+', '-').replace('/', '_')
+    """Generate a signed token for unsubscribing (see unsubscribe.py)."""
+    return unsubscribe.generate_token(email)
 
 def verify_unsubscribe_token(token):
-    """Verify an unsubscribe token and return the email if valid."""
-    try:
-        # Replace URL-safe characters back
-        token = token.replace('-', '+').replace('_', '/')
-        
-        # Decrypt using your Fernet key
-        from cryptography.fernet import Fernet
-        fernet_key = os.getenv("FERNET_KEY")
-        if not fernet_key:
-            print("FERNET_KEY environment variable not found")
-            return None
-            
-        try:
-            f = Fernet(fernet_key.encode())
-            message = f.decrypt(token.encode()).decode()
-        except Exception as e:
-            print(f"Token decryption error: {str(e)}")
-            return None
-            
-        # Split to get email and timestamp
-        try:
-            email, timestamp = message.split('|')
-        except ValueError:
-            print(f"Invalid token format. Expected 'email|timestamp', got: {message}")
-            return None
-            
-        # Check if token is expired (extend to 365 days)
-        token_time = datetime.fromtimestamp(int(timestamp))
-        if (datetime.now() - token_time).days > 365:  # Extended from 30 to 365 days
-            print(f"Token expired. Created on {token_time.isoformat()}")
-            return None
-            
-        return email
-        
-    except Exception as e:
-        print(f"Token verification error: {str(e)}")
-        return None  # Invalid token
+    """Verify an unsubscribe token (new or legacy Fernet) and return the email if valid."""
+    return unsubscribe.verify_token(token)
 
 def unsubscribe_email(email):
     """Remove a subscriber from the database."""
@@ -0,0 +1,50 @@
+import smtplib
+
+import dispatcher
+from mailer import Mailer
+from outbox import Outbox
+
+MAIL = {"mail": {"starttls": False, "pool_size": 2, "max_per_second": 0, "attempts": 3, "backoff_s": 0}}
+
+class RejectingLogin:
+    """smtplib.SMTP stand-in whose login always fails."""
+    logins = 0
+
+    def __init__(self, host, port, timeout=None):
+        pass
+
+    def login(self, user, password):
+        RejectingLogin.logins += 1
+        raise smtplib.SMTPAuthenticationError(535, b"5.7.8 Username and Password not accepted")
+
+    def close(self):
+        pass
+
+def messages(n):
+    return [dispatcher.message(f"user{i}@example.com", "Bamba", "<p>hi</p>", key=f"test:{i}") for i in range(n)]
+
+def test_login_failure_leaves_messages_pending(tmp_path, monkeypatch):
+    monkeypatch.setattr(smtplib, "SMTP", RejectingLogin)
+    RejectingLogin.logins = 0
+    box    = Outbox(str(tmp_path / "outbox.db"), MAIL)
+    box.enqueue(messages(5))
+    mailer = Mailer("localhost", 25, user="bot", password="wrong", from_email="bot@example.com", config=MAIL)
+
+    report = box.drain(mailer=mailer, config=MAIL)
+
+    assert report.sent == 0 and report.failed == 0 and report.deferred == 5
+    assert isinstance(report.aborted, smtplib.SMTPAuthenticationError)
+    assert RejectingLogin.logins <= MAIL["mail"]["pool_size"]   # not one login per message
+    assert box.stats() == {"pending": 5}
+    attempts = box.db.execute("SELECT DISTINCT attempts FROM outbox").fetchall()
+    assert attempts == [(0,)]
+
+def test_classify():
+    assert dispatcher.classify(smtplib.SMTPAuthenticationError(535, b"bad credentials")) == "server"
+    assert dispatcher.classify(smtplib.SMTPSenderRefused(550, b"no", "bot@example.com")) == "server"
+    assert dispatcher.classify(smtplib.SMTPDataError(550, b"5.4.5 Daily user sending quota exceeded")) == "server"
+    assert dispatcher.classify(smtplib.SMTPServerDisconnected("gone")) == "server"
+    assert dispatcher.classify(smtplib.SMTPDataError(451, b"try again")) == "temporary"
+    assert dispatcher.classify(smtplib.SMTPDataError(554, b"message rejected")) == "permanent"
+    assert dispatcher.classify(smtplib.SMTPRecipientsRefused({"a@x": (550, b"no such user")})) == "permanent"
+    assert dispatcher.classify(smtplib.SMTPRecipientsRefused({"a@x": (450, b"greylisted")})) == "temporary"
@@ -0,0 +1,40 @@
+import random
+from datetime import datetime, timedelta
+
+from run_history import RunLog, diff_runs, run_timestamp
+
+PRODUCTS = ["Osem Bamba Peanut Snack KB | 25g", "Osem Bamba Peanut Snack | 100g", "Bamba Strawberry | 60g"]
+
+def make_runs(n, seed=7):
+    rng, t0, runs = random.Random(seed), datetime(2026, 5, 20, 8, 0), []
+    for i in range(n):
+        ts  = (t0 + timedelta(hours=i)).isoformat() + "+08:00"
+        run = []
+        for store in ("Dianella", "Mirrabooka"):
+            products = [{"name": name, "price": rng.choice(["$2.00", "$2.50"]), "available": rng.random() < 0.5}
+                        for name in PRODUCTS]
+            run.append({"store": store, "timestamp": ts, "available": any(p["available"] for p in products),
+                        "products": products})
+        runs.append(run)
+    return runs
+
+def archived_log(tmp_path, runs):
+    archive = {"dir": str(tmp_path / "archive"), "period": "week", "compression": "gzip"}
+    log = RunLog(str(tmp_path / "history.jsonl"), keep_runs=100, compact_every=10**6,
+                 encoding="compact", snapshot_every=24, archive=archive)
+    for run in runs:
+        log.append(run)
+    log.compact()
+    return log
+
+def test_changes_across_the_archive_boundary(tmp_path):
+    runs = make_runs(400)
+    log  = archived_log(tmp_path, runs)
+    assert len(log.archive) and len(log.archive) + len(log._offsets) == len(runs)
+    first_hot = log._stamps[0]
+    in_archive = run_timestamp(runs[len(log.archive) // 2])
+    for since in (in_archive, first_hot, log._stamps[10], in_archive[:10]):
+        assert log.changes(since=since) == diff_runs(runs, since), since
+    until = log._stamps[20]
+    assert log.changes(since=in_archive, until=until) == \
+        diff_runs([r for r in runs if run_timestamp(r) < until], in_archive)
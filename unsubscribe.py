@@ -0,0 +1,105 @@
+"""
+Unsubscribe tokens for the links at the bottom of every email.
+– New tokens are "1.<email>.<expiry>.<signature>": the address (base64url),
+  the expiry (Unix time, base 36) and a truncated HMAC-SHA256 over both. They
+  are stateless, about a third the length of a Fernet token, and cost one
+  HMAC each.
+– The HMAC key is derived once per process from UNSUBSCRIBE_SECRET (or,
+  without one, FERNET_KEY). generate_tokens() signs a whole recipient list
+  from one prepared HMAC object.
+– verify_token() still accepts the Fernet "email|timestamp" tokens in
+  links sent before, with their 365-day lifetime.
+`python benchmarks/unsubscribe_tokens.py` compares this with a Fernet token per email.
+"""
+
+import os, hmac, time, base64, hashlib
+from functools import lru_cache
+
+VERSION  = "1"
+TTL_DAYS = 365
+MAC_BYTES = 16
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _base36(n):
+    digits = ""
+    while True:
+        n, r = divmod(n, 36)
+        digits = "0123456789abcdefghijklmnopqrstuvwxyz"[r] + digits
+        if not n:
+            return digits
+
+@lru_cache(maxsize=None)
+def _signer(secret):
+    """An HMAC object keyed for unsubscribe tokens; copy() it per token."""
+    key = hashlib.sha256(b"bamba-unsubscribe|" + secret.encode()).digest()
+    return hmac.new(key, digestmod=hashlib.sha256)
+
+@lru_cache(maxsize=None)
+def _fernet(key):
+    from cryptography.fernet import Fernet
+    return Fernet(key.encode())
+
+def _secret():
+    secret = os.getenv("UNSUBSCRIBE_SECRET") or os.getenv("FERNET_KEY")
+    if not secret:
+        raise RuntimeError("UNSUBSCRIBE_SECRET (or FERNET_KEY) is not set")
+    return secret
+
+def _sign(signer, body):
+    mac = signer.copy()
+    mac.update(body.encode())
+    return _b64(mac.digest()[:MAC_BYTES])
+
+def generate_tokens(emails, ttl_days=TTL_DAYS, now=None):
+    """{email: token} for a list of recipients, all with the same expiry."""
+    signer  = _signer(_secret())
+    expires = _base36(int((now or time.time()) + ttl_days * 86400))
+    tokens  = {}
+    for email in emails:
+        body = f"{VERSION}.{_b64(email.encode())}.{expires}"
+        tokens[email] = f"{body}.{_sign(signer, body)}"
+    return tokens
+
+def generate_token(email, ttl_days=TTL_DAYS, now=None):
+    return generate_tokens([email], ttl_days, now)[email]
+
+def _verify_legacy(token, now):
+    """The email from a Fernet "email|timestamp" token, or None."""
+    key = os.getenv("FERNET_KEY")
+    if not key:
+        print("FERNET_KEY environment variable not found")
+        return None
+    try:
+        message = _fernet(key).decrypt(token.encode()).decode()
+        email, timestamp = message.split("|")
+    except Exception as e:
+        print(f"Token decryption error: {e}")
+        return None
+    if (now - int(timestamp)) // 86400 > TTL_DAYS:
+        print(f"Token expired. Created at {time.strftime('%Y-%m-%d', time.localtime(int(timestamp)))}")
+        return None
+    return email
+
+def verify_token(token, now=None):
+    """The email address an unsubscribe token was made for, or None if it is
+    invalid or expired."""
+    now = now or time.time()
+    if not token.startswith(VERSION + "."):
+        return _verify_legacy(token, now)
+    try:
+        _, email, expires, sig = token.split(".")
+        body = token.rsplit(".", 1)[0]
+        if not hmac.compare_digest(sig, _sign(_signer(_secret()), body)):
+            return None
+        if int(expires, 36) < now:
+            print("Token expired.")
+            return None
+        return _unb64(email).decode()
+    except (ValueError, RuntimeError) as e:
+        print(f"Token verification error: {e}")
+        return None